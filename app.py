@@ -1,18 +1,123 @@
 import os
-from fastapi import FastAPI, HTTPException, Header
+import hmac
+import json
+import secrets
+import time
+import asyncio
+import anyio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Header, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
-from validator import validate, load_brand_config
+from validator import validate_async, validate_batch, load_brand_config_async
 from google_sheets_service import sheets_service
 from content_generator import content_generator
+from brand_index import brand_index
+from config_cache import config_cache
+from config_snapshot import local_snapshot
+from proof_writer import proof_writer
+from proof_index import proof_index
+from proof_merkle import merkle_store
+from validation_cache import result_cache, IdempotencyKeyReused
+from link_pipeline import short_links
+from circuit_breaker import sheets_breaker
+from metrics import registry, http_requests, http_request_seconds
+from profiling import ProfilingMiddleware, profile_store
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
 API_TOKEN = os.getenv("VALIDATOR_TOKEN", None)
+DEBUG_TOKEN = os.getenv("DEBUG_TOKEN", None)
+BATCH_MAX_ITEMS = int(os.getenv("VALIDATE_BATCH_MAX_ITEMS", "2000"))
+STREAM_CONCURRENCY = int(os.getenv("VALIDATE_STREAM_CONCURRENCY", "8"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("VALIDATE_STREAM_MAX_LINE_BYTES", "1048576"))
+THREADPOOL_SIZE = int(os.getenv("APP_THREADPOOL_SIZE", "40"))
 
-app = FastAPI(title="Multi-Brand GPT Validator", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Size the pool that blocking work (file I/O, batch checks, generation) is offloaded to
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # One read of the compiled config snapshot; JSON files remain the fallback
+    local_snapshot.load()
+    # Warm the Sheets snapshot so requests never wait on Google after startup
+    sheets_service.start_background_refresh()
+    yield
+    sheets_service.stop_background_refresh()
+    # Drain queued proof records before the worker exits
+    proof_writer.shutdown()
+    proof_index.close()
+    short_links.close()
+
+app = FastAPI(title="Multi-Brand GPT Validator", version="1.0.0", lifespan=lifespan)
+
+class MetricsMiddleware:
+    """
+    Count and time every HTTP request by route template
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streamed responses pass
+    through untouched and are timed until their last chunk.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the scope; using its
+            # template keeps /brands/{brand} one series however many brands exist
+            route = scope.get("route")
+            endpoint = getattr(route, "path", "unmatched")
+            http_requests.inc(endpoint, scope["method"], str(status))
+            http_request_seconds.observe(time.perf_counter() - started, endpoint)
+
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware, token=DEBUG_TOKEN or "")
+
+def _collect_state() -> List:
+    """Gauges and counters mirrored from the caches, proof writer and Sheets breaker"""
+    cache = config_cache.stats()
+    results = result_cache.stats()
+    writer = proof_writer.stats()
+    breaker = sheets_breaker.stats()
+    sheets = sheets_service.snapshot_info()
+    families = [
+        ("validator_config_cache_hits_total", "counter", "Config cache hits", [({}, cache["hits"])]),
+        ("validator_config_cache_misses_total", "counter", "Config cache misses", [({}, cache["misses"])]),
+        ("validator_config_cache_hit_ratio", "gauge", "Config cache hits / lookups since start", [({}, cache["hit_ratio"])]),
+        ("validator_config_cache_entries", "gauge", "Brand configs held in the cache", [({}, cache["entries"])]),
+        ("validator_result_cache_hits_total", "counter", "Validations replayed from the result cache", [({}, results["hits"])]),
+        ("validator_result_cache_misses_total", "counter", "Validations not found in the result cache", [({}, results["misses"])]),
+        ("validator_result_cache_entries", "gauge", "Validation results held for replay", [({}, results["entries"])]),
+        ("validator_proof_queue_depth", "gauge", "Proof write batches waiting for the writer", [({}, writer["queue_depth"])]),
+        ("validator_proof_records_flushed_total", "counter", "Proof records written by the group-commit writer", [({}, writer["flushed_records"])]),
+        ("validator_proof_write_failures_total", "counter", "Failed proof group commits", [({}, writer["failures"])]),
+        ("validator_sheets_breaker_open", "gauge", "1 while the Google Sheets circuit is open or half-open",
+         [({}, 0 if breaker["state"] == "closed" else 1)]),
+        ("validator_sheets_breaker_rejected_total", "counter", "Sheets lookups skipped because the circuit was open", [({}, breaker["rejected"])]),
+        ("validator_sheets_refresh_failures_total", "counter", "Failed Sheets snapshot refreshes", [({}, sheets["refresh_failures"])]),
+    ]
+    if "age_seconds" in sheets:
+        families.append(("validator_sheets_snapshot_age_seconds", "gauge", "Age of the Sheets snapshot", [({}, sheets["age_seconds"])]))
+    return families
+
+registry.add_collector(_collect_state)
 
 class Link(BaseModel):
     url: str
@@ -34,11 +139,18 @@ class ValidateRequest(BaseModel):
     week: Optional[str] = None
     post_id: Optional[str] = None
 
+class BatchValidateRequest(BaseModel):
+    items: List[ValidateRequest] = Field(..., max_length=BATCH_MAX_ITEMS)
+
 class VariationRequest(BaseModel):
     base_content: Dict[str, Any]
     brand: str = Field(..., examples=["Amar"])
     platform: str = Field(..., examples=["Instagram"])
     count: int = Field(default=3, ge=1, le=5)
+    seed: Optional[int] = Field(default=None, ge=0, le=2**63 - 1)
+    # Check candidates against the brand rules and return only those that pass
+    compliant: bool = True
+    max_attempts: int = Field(default=5, ge=1, le=20)
 
 def _auth_check(authorization: Optional[str]):
     if not API_TOKEN:
@@ -50,65 +162,143 @@ def _auth_check(authorization: Optional[str]):
         raise HTTPException(status_code=403, detail="Invalid token")
 
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True}
 
-@app.get("/debug")
-def debug():
-    import os
+def _debug_auth_check(authorization: Optional[str]):
+    # Debug endpoints expose internals, so unlike the API they are off without a token
+    if not DEBUG_TOKEN:
+        raise HTTPException(status_code=404, detail="Debug endpoints are disabled (set DEBUG_TOKEN)")
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+    if not hmac.compare_digest(authorization.split(" ", 1)[1], DEBUG_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid token")
+
+def _debug_info() -> Dict:
     return {
-        "current_dir": os.getcwd(),
-        "files": os.listdir("."),
-        "config_exists": os.path.exists("config"),
-        "config_files": os.listdir("config") if os.path.exists("config") else "No config dir"
+        "threadpool_size": THREADPOOL_SIZE,
+        "config_cache": config_cache.stats(),
+        "config_snapshot": local_snapshot.stats(),
+        "proof_writer": proof_writer.stats(),
+        "proof_index": proof_index.stats(),
+        "validation_cache": result_cache.stats(),
+        "short_links": short_links.stats(),
+        "variation_cache": content_generator.cache_stats(),
+        "sheets_snapshot": sheets_service.snapshot_info(),
+        "sheets_breaker": sheets_breaker.stats(),
+        "profiles": profile_store.list()[:10]
     }
 
+@app.get("/debug")
+async def debug(authorization: Optional[str] = Header(None)):
+    """Runtime state of the caches, writers and Sheets link, plus the latest profiles"""
+    _debug_auth_check(authorization)
+    return await run_in_threadpool(_debug_info)
+
+@app.get("/debug/profiles")
+async def list_profiles(authorization: Optional[str] = Header(None)):
+    """
+    Stored request profiles, newest first
+
+    A request is profiled when sent with "X-Profile: <DEBUG_TOKEN>" or when
+    picked by PROFILE_SAMPLE_RATE; its response carries X-Profile-Id.
+    """
+    _debug_auth_check(authorization)
+    profiles = await run_in_threadpool(profile_store.list)
+    return {"profiles": profiles, "count": len(profiles), "max_profiles": profile_store.max_profiles}
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("prof", pattern="^(prof|text)$", description="prof: cProfile dump for pstats/snakeviz; text: pstats report"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    authorization: Optional[str] = Header(None)
+):
+    """Download one profile"""
+    _debug_auth_check(authorization)
+    if format == "text":
+        report = await run_in_threadpool(profile_store.summary, profile_id, sort)
+        if report is None:
+            raise HTTPException(status_code=404, detail=f"No profile {profile_id}")
+        return PlainTextResponse(report)
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No profile {profile_id}")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+@app.get("/metrics")
+async def metrics(authorization: Optional[str] = Header(None)):
+    """Prometheus text-format metrics"""
+    _auth_check(authorization)
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/banks/{brand}")
-def banks(brand: str, authorization: Optional[str] = Header(None)):
+async def banks(brand: str, authorization: Optional[str] = Header(None)):
     _auth_check(authorization)
     try:
-        cfg = load_brand_config(brand)
+        cfg = await load_brand_config_async(brand)
         return {"brand": brand, "keys": list(cfg.keys())}
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+def _accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """True if Accept-Encoding allows gzip with q > 0 (explicitly or through *)"""
+    explicit = wildcard = None
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [p.strip() for p in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        coding = coding.lower()
+        if coding in ("gzip", "x-gzip"):
+            explicit = max(explicit or 0.0, q)
+        elif coding == "*":
+            wildcard = q
+    if explicit is not None:
+        return explicit > 0
+    return bool(wildcard)
+
 @app.get("/brands")
-def get_brands(authorization: Optional[str] = Header(None)):
+async def get_brands(
+    request: Request,
+    fields: Optional[str] = Query(None, description="Comma-separated summary fields to return"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    authorization: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Brand summaries from the prebuilt index, with ETag revalidation and gzip"""
     _auth_check(authorization)
-    import os
-    import json
-    
-    brands = []
-    config_dir = "config"
-    
-    if os.path.exists(config_dir):
-        for file in os.listdir(config_dir):
-            if file.endswith('.json') and file != 'multibrand.json':
-                brand_name = file.replace('.json', '').replace('_', ' ').title()
-                try:
-                    with open(os.path.join(config_dir, file), 'r') as f:
-                        cfg = json.load(f)
-                        brands.append({
-                            "name": cfg.get("brand", brand_name),
-                            "voice": cfg.get("voice", {}),
-                            "story": cfg.get("story", ""),
-                            "platforms": cfg.get("platforms", []),
-                            "hashtag_banks": cfg.get("hashtag_bank", {}),
-                            "cta_banks": cfg.get("cta_bank", {}),
-                            "media_policy": cfg.get("media_policy", {}),
-                            "forbidden_words": cfg.get("forbidden_words", []),
-                            "allowed_domains": cfg.get("link_policy", {}).get("allowed_domains", [])
-                        })
-                except Exception as e:
-                    continue
+    snapshot = await run_in_threadpool(brand_index.current) if brand_index.needs_check() else brand_index.snapshot
+    try:
+        page = brand_index.render(snapshot, fields, offset, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    return {"brands": brands}
+    headers = {"ETag": page.etag, "Vary": "Accept-Encoding", "Cache-Control": "private, no-cache"}
+    if _etag_matches(if_none_match, page.etag):
+        return Response(status_code=304, headers=headers)
+    if _accepts_gzip(request.headers.get("accept-encoding")):
+        headers["Content-Encoding"] = "gzip"
+        return Response(page.gzip_body, media_type="application/json", headers=headers)
+    return Response(page.body, media_type="application/json", headers=headers)
 
 @app.get("/brands/{brand}")
-def get_brand_info(brand: str, authorization: Optional[str] = Header(None)):
+async def get_brand_info(brand: str, authorization: Optional[str] = Header(None)):
     _auth_check(authorization)
     try:
-        cfg = load_brand_config(brand)
+        cfg = await load_brand_config_async(brand)
         return {
             "brand": cfg.get("brand", brand),
             "voice": cfg.get("voice", {}),
@@ -124,37 +314,240 @@ def get_brand_info(brand: str, authorization: Optional[str] = Header(None)):
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+def _validation_body(ok: bool, errors: List[str], payload: Dict) -> Dict:
+    if not ok:
+        return {"valid": False, "errors": errors, "suggestions": {}}
+    return {"valid": True, **payload}
+
 @app.post("/validate")
-def do_validate(req: ValidateRequest, authorization: Optional[str] = Header(None)):
+async def do_validate(req: ValidateRequest, authorization: Optional[str] = Header(None),
+                      idempotency_key: Optional[str] = Header(None)):
+    """
+    Validate one bundle
+
+    Resubmitting an identical bundle (same config version and proof week), or
+    repeating an Idempotency-Key header, returns the stored result without
+    rerunning the checks or writing another proof record.
+    """
     try:
         _auth_check(authorization)
-        ok, errors, payload = validate(req.model_dump())
-        if not ok:
-            return {"valid": False, "errors": errors, "suggestions": {}}
-        return {"valid": True, **payload}
+        return _validation_body(*await validate_async(req.model_dump(), idempotency_key))
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         return {"error": str(e), "type": type(e).__name__}
 
+@app.post("/validate/batch")
+async def do_validate_batch(req: BatchValidateRequest, authorization: Optional[str] = Header(None)):
+    """Validate many bundles in one request; results come back in input order"""
+    _auth_check(authorization)
+    results = []
+    checked = await run_in_threadpool(validate_batch, [item.model_dump() for item in req.items])
+    for ok, errors, payload in checked:
+        results.append(payload if "error" in payload else _validation_body(ok, errors, payload))
+    return {
+        "results": results,
+        "count": len(results),
+        "valid_count": sum(1 for r in results if r.get("valid"))
+    }
+
+async def _validate_line(index: int, line: bytes) -> str:
+    try:
+        bundle = ValidateRequest.model_validate_json(line).model_dump()
+        result = _validation_body(*await validate_async(bundle))
+    except Exception as e:
+        result = {"error": str(e), "type": type(e).__name__}
+    return json.dumps({"index": index, **result}, ensure_ascii=False) + "\n"
+
+async def _stream_results(request: Request):
+    """
+    Validate NDJSON bundles as they arrive, at most STREAM_CONCURRENCY at a time
+
+    The body is only read while there is room in the window, so memory stays
+    bounded by the window and the longest line, not by the size of the plan.
+    """
+    pending = set()
+    index = 0
+    buf = b""
+    skipping = False
+
+    async def drain(wait_for_one: bool):
+        nonlocal pending
+        if not pending:
+            return []
+        if wait_for_one:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            done = {t for t in pending if t.done()}
+            pending -= done
+        return [t.result() for t in done]
+
+    def too_long() -> str:
+        return json.dumps({"index": index, "error": f"Line exceeds {STREAM_MAX_LINE_BYTES} bytes",
+                           "type": "ValueError"}) + "\n"
+
+    async def submit(line: bytes):
+        nonlocal index
+        if len(line) > STREAM_MAX_LINE_BYTES:
+            lines = [too_long()]
+            index += 1
+            return lines
+        lines = []
+        while len(pending) >= STREAM_CONCURRENCY:
+            lines += await drain(wait_for_one=True)
+        pending.add(asyncio.ensure_future(_validate_line(index, line)))
+        index += 1
+        return lines
+
+    async for chunk in request.stream():
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            if skipping:
+                skipping = False
+                continue
+            if line.strip():
+                for out in await submit(line):
+                    yield out
+        if len(buf) > STREAM_MAX_LINE_BYTES and not skipping:
+            yield too_long()
+            index += 1
+            buf = b""
+            skipping = True
+        elif skipping:
+            buf = b""
+        for out in await drain(wait_for_one=False):
+            yield out
+
+    if buf.strip() and not skipping:
+        for out in await submit(buf):
+            yield out
+    while pending:
+        for out in await drain(wait_for_one=True):
+            yield out
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator reads the request body itself
+
+    The stock response consumes receive() to watch for disconnects, which would
+    swallow request body chunks; here the body reader sees the disconnect instead.
+    """
+    async def listen_for_disconnect(self, receive) -> None:
+        await anyio.sleep_forever()
+
+@app.post("/validate/stream")
+async def do_validate_stream(request: Request, authorization: Optional[str] = Header(None)):
+    """
+    Validate a newline-delimited stream of bundles
+
+    Each input line is a ValidateRequest; one JSON line comes back per bundle
+    as soon as it finishes, tagged with its zero-based input "index".
+    """
+    _auth_check(authorization)
+    return RequestStreamingResponse(_stream_results(request), media_type="application/x-ndjson")
+
+@app.get("/proofs/by-hash/{sha}")
+async def proofs_by_hash(sha: str, authorization: Optional[str] = Header(None)):
+    """Every proof record with this bundle sha256, newest first"""
+    _auth_check(authorization)
+    proofs = await run_in_threadpool(proof_index.by_hash, sha)
+    if not proofs:
+        raise HTTPException(status_code=404, detail=f"No proof with sha256 {sha}")
+    return {"sha256": sha.lower(), "proofs": proofs, "count": len(proofs)}
+
+@app.get("/proofs/{brand}/weeks/{week}/root")
+async def proof_week_root(brand: str, week: str, authorization: Optional[str] = Header(None)):
+    """Merkle root over a brand's proof records for one week"""
+    _auth_check(authorization)
+    try:
+        root = await run_in_threadpool(merkle_store.root, brand, week)
+    except ValueError:
+        root = None
+    if not root or not root["size"]:
+        raise HTTPException(status_code=404, detail=f"No proofs for {brand}/{week}")
+    return root
+
+@app.get("/proofs/{brand}/{post_id}/inclusion")
+async def proof_inclusion(brand: str, post_id: str, week: Optional[str] = Query(None),
+                          sha256: Optional[str] = Query(None), authorization: Optional[str] = Header(None)):
+    """
+    Merkle inclusion proof for a post's newest proof record (optionally of a given
+    week or bundle hash), verifiable against /proofs/{brand}/weeks/{week}/root
+    """
+    _auth_check(authorization)
+    proofs = await run_in_threadpool(proof_index.by_post, brand, post_id)
+    proofs = [p for p in proofs
+              if (week is None or p["week"] == week) and (sha256 is None or p["sha256"] == sha256.lower())]
+    if not proofs:
+        raise HTTPException(status_code=404, detail=f"No proof for {brand}/{post_id}")
+    latest = proofs[0]
+    record = {"post_id": latest["post_id"], "sha256": latest["sha256"], "timestamp": latest["timestamp"]}
+    proof = await run_in_threadpool(merkle_store.prove, latest["brand"], latest["week"], record, latest["leaf"])
+    if proof is None:
+        raise HTTPException(status_code=404, detail=f"Proof for {brand}/{post_id} is not in the {latest['week']} tree")
+    return proof
+
+@app.get("/proofs/{brand}/{post_id}")
+async def proofs_by_post(brand: str, post_id: str, authorization: Optional[str] = Header(None)):
+    """Every proof record for a post, newest first"""
+    _auth_check(authorization)
+    proofs = await run_in_threadpool(proof_index.by_post, brand, post_id)
+    if not proofs:
+        raise HTTPException(status_code=404, detail=f"No proof for {brand}/{post_id}")
+    return {"brand": brand, "post_id": post_id, "proofs": proofs, "count": len(proofs)}
+
 @app.post("/generate/variations")
-def generate_variations(request: VariationRequest, authorization: Optional[str] = Header(None)):
+async def generate_variations(request: VariationRequest, authorization: Optional[str] = Header(None)):
     """Generate multiple variations of content"""
     try:
         _auth_check(authorization)
         
-        variations = content_generator.generate_variations(
+        # Always seeded, so a retry with the returned seed gets the same (cached) variations
+        seed = request.seed if request.seed is not None else secrets.randbelow(2**32)
+        if not request.compliant:
+            variations = await run_in_threadpool(
+                content_generator.generate_variations,
+                request.base_content,
+                request.brand,
+                request.platform,
+                request.count,
+                seed
+            )
+            return {
+                "success": True,
+                "variations": variations,
+                "count": len(variations),
+                "brand": request.brand,
+                "platform": request.platform,
+                "seed": seed,
+                "message": f"Generated {len(variations)} variations for {request.brand} on {request.platform}"
+            }
+
+        generated = await run_in_threadpool(
+            content_generator.generate_compliant_variations,
             request.base_content,
             request.brand,
             request.platform,
-            request.count
+            request.count,
+            seed,
+            request.max_attempts
         )
-        
+        variations = generated["variations"]
+        message = f"Generated {len(variations)} compliant variations for {request.brand} on {request.platform}"
+        if len(variations) < request.count:
+            message += f" ({request.count - len(variations)} could not be made compliant; see validation)"
         return {
             "success": True,
             "variations": variations,
             "count": len(variations),
+            "requested": request.count,
+            "validation": generated["results"],
+            "candidates": generated["candidates"],
             "brand": request.brand,
             "platform": request.platform,
-            "message": f"Generated {len(variations)} variations for {request.brand} on {request.platform}"
+            "seed": seed,
+            "message": message
         }
     except Exception as e:
         return {
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark for GoogleSheetsService._dataframe_to_config
+
+Compares the grouped conversion against the previous row-by-row
+(DataFrame.iterrows) implementation on a large synthetic brand tab and
+checks that both produce byte-identical configs.
+"""
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, List
+
+import pandas as pd
+
+from google_sheets_service import GoogleSheetsService
+
+PLATFORMS = ["Instagram", "LinkedIn", "TikTok", "X", "Facebook", "YouTube"]
+CATEGORIES = ["Voice", "Story", "Platforms", "Caption Rules", "Hashtag Bank", "CTA Bank",
+              "Media Policy", "Forbidden Words", "Link Policy", "Required Disclosures",
+              "Posting Frequency", "Unknown"]
+
+def synthetic_tab(rows: int, brand: str = "Amar", seed: int = 0) -> List[List[str]]:
+    """Raw tab values (header first) with every category, blanks and stray whitespace"""
+    rng = random.Random(seed)
+    data = [["Brand", "Category", "Platform", "Key", "Value"]]
+    for i in range(rows):
+        category = rng.choice(CATEGORIES + [""])
+        platform = rng.choice(PLATFORMS + ["", " X "])
+        key = rng.choice(["tone", "Style", "max_chars", "allowed", "allowed_domains", f"k{i % 50}", "", " pad "])
+        value = rng.choice(["TRUE", "false", f"#Tag{i}", f"value {i}", " spaced ", ""])
+        data.append([brand, category, platform, key, value])
+    return data
+
+def dataframe_to_config_iterrows(df: pd.DataFrame, brand_name: str) -> Dict:
+    """Previous row-by-row implementation, kept as the reference"""
+    config = {
+        "brand": brand_name,
+        "voice": {},
+        "story": "",
+        "platforms": [],
+        "hashtag_bank": {},
+        "cta_bank": {},
+        "media_policy": {},
+        "forbidden_words": [],
+        "link_policy": {"allowed_domains": []},
+        "required_disclosures": [],
+        "caption_rules": {},
+        "posting_frequency": {},
+        "proof_manifest": {
+            "timezone": "UTC",
+            "root": "/proofs"
+        }
+    }
+
+    for _, row in df.iterrows():
+        category = row.get('Category', '').strip()
+        platform = row.get('Platform', '').strip()
+        key = row.get('Key', '').strip()
+        value = row.get('Value', '').strip()
+
+        if not category or not key:
+            continue
+
+        if category == 'Voice':
+            config['voice'][key.lower()] = value
+        elif category == 'Story':
+            config['story'] = value
+        elif category == 'Platforms':
+            if value.lower() == 'true':
+                config['platforms'].append(key)
+        elif category == 'Caption Rules':
+            if platform and platform not in config['caption_rules']:
+                config['caption_rules'][platform] = {}
+            if platform:
+                config['caption_rules'][platform][key] = value
+        elif category == 'Hashtag Bank':
+            if platform not in config['hashtag_bank']:
+                config['hashtag_bank'][platform] = []
+            config['hashtag_bank'][platform].append(value)
+        elif category == 'CTA Bank':
+            if platform not in config['cta_bank']:
+                config['cta_bank'][platform] = []
+            config['cta_bank'][platform].append(value)
+        elif category == 'Media Policy':
+            if platform not in config['media_policy']:
+                config['media_policy'][platform] = {}
+            config['media_policy'][platform][key] = value
+        elif category == 'Forbidden Words':
+            config['forbidden_words'].append(value)
+        elif category == 'Link Policy':
+            if key == 'allowed_domains':
+                config['link_policy']['allowed_domains'].append(value)
+        elif category == 'Required Disclosures':
+            config['required_disclosures'].append(value)
+        elif category == 'Posting Frequency':
+            if platform not in config['posting_frequency']:
+                config['posting_frequency'][platform] = {}
+            config['posting_frequency'][platform][key] = value
+
+    return config
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def run(rows: int, repeat: int) -> Dict:
+    """Check equivalence and time both implementations on one synthetic tab"""
+    data = synthetic_tab(rows)
+    df = pd.DataFrame(data[1:], columns=data[0])
+    service = GoogleSheetsService.__new__(GoogleSheetsService)
+
+    legacy = json.dumps(dataframe_to_config_iterrows(df, "Amar"), ensure_ascii=False)
+    grouped = json.dumps(service._dataframe_to_config(df, "Amar"), ensure_ascii=False)
+    if legacy != grouped:
+        raise AssertionError(f"Grouped conversion differs from iterrows on {rows} rows")
+
+    legacy_s = _best_of(lambda: dataframe_to_config_iterrows(df, "Amar"), repeat)
+    grouped_s = _best_of(lambda: service._dataframe_to_config(df, "Amar"), repeat)
+    return {"rows": rows, "iterrows_ms": legacy_s * 1000, "grouped_ms": grouped_s * 1000,
+            "speedup": legacy_s / grouped_s}
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Sheets-to-config conversion')
+    parser.add_argument('--rows', type=int, nargs='+', default=[100, 10000, 100000], help='Synthetic tab sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is reported)')
+
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        r = run(rows, args.repeat)
+        print(f"✓ {r['rows']:>7} rows: iterrows {r['iterrows_ms']:9.1f} ms | "
+              f"grouped {r['grouped_ms']:8.1f} ms | {r['speedup']:6.1f}x (identical output)")
+
+if __name__ == "__main__":
+    main()
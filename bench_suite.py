@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Offline microbenchmark suite
+Times the validator, each check_* function, the variation generator, the Sheets
+conversion and the Excel converter on synthetic fixtures, without a server.
+Each run is appended to .benchmarks/results.jsonl together with the git commit,
+so runs from different commits can be compared with --compare.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform as platform_mod
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+import validator
+from config_cache import config_cache
+from content_generator import content_generator
+from proof_index import ProofIndex
+from proof_log import ProofLog
+from proof_merkle import MerkleStore
+from proof_writer import proof_writer
+from validation_cache import result_cache
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS = os.path.join(ROOT, ".benchmarks", "results.jsonl")
+EXCEL_FIXTURE = os.path.join(ROOT, "Social Meida -brands × platforms.xlsx")
+
+PLATFORMS = ["Instagram", "LinkedIn", "TikTok", "X", "Facebook"]
+WORDS = ["phone", "quality", "deal", "refurbished", "warranty", "battery", "camera", "screen",
+         "trade", "upgrade", "price", "today", "store", "guaranteed", "fast", "delivery"]
+
+# --- Synthetic fixtures ----------------------------------------------------
+
+def synthetic_brand(name: str = "Benchbrand", forbidden: int = 50, hashtags: int = 40,
+                    domains: int = 10, seed: int = 0) -> Dict:
+    """Brand config shaped like config/*.json, with configurable bank sizes"""
+    rng = random.Random(seed)
+    return {
+        "brand": name,
+        "voice": {"tone": "professional", "style": "clear"},
+        "story": f"{name} sells refurbished phones.",
+        "platforms": PLATFORMS,
+        "caption_rules": {p: {"max_chars": 280 if p == "X" else 2200} for p in PLATFORMS},
+        "hashtag_bank": {p: [f"#{p}Tag{i}" for i in range(hashtags)] for p in PLATFORMS},
+        "cta_bank": {p: ["Shop now", "Learn more", "Get yours", "Trade in today"] for p in PLATFORMS},
+        "media_policy": {p: {"allowed": ["image", "video", "carousel"], "max_carousel": 10} for p in PLATFORMS},
+        "forbidden_words": [f"{rng.choice(WORDS)}{i}x" for i in range(forbidden)] + ["scam", "fake"],
+        "link_policy": {
+            "allowed_domains": [f"shop{i}.example.com" for i in range(domains)] + ["example.com"],
+            "utm_template": "utm_source={platform}&utm_campaign={brand}_{week}",
+        },
+        "required_disclosures": [],
+        "proof_manifest": {"timezone": "UTC", "root": "/proofs"},
+    }
+
+def synthetic_posts(cfg: Dict, count: int, invalid_ratio: float = 0.2, seed: int = 0) -> List[Dict]:
+    """Post bundles for cfg; roughly invalid_ratio of them break at least one rule"""
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        platform = rng.choice(PLATFORMS)
+        caption = " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 40)))
+        bundle = {
+            "brand": cfg["brand"],
+            "platform": platform,
+            "post_id": f"bench-{i}",
+            "caption": caption,
+            "hashtags": rng.sample(cfg["hashtag_bank"][platform], 3),
+            "cta": rng.choice(cfg["cta_bank"][platform]),
+            "media_suggestion": {"type": "carousel", "count": rng.randint(1, 10)},
+            "links": [{"url": f"https://shop{rng.randint(0, 9)}.example.com/p/{i}", "utm": True}],
+            "week": "W01",
+        }
+        if rng.random() < invalid_ratio:
+            breakage = rng.choice(["forbidden", "hashtag", "domain", "media"])
+            if breakage == "forbidden":
+                bundle["caption"] += " scam"
+            elif breakage == "hashtag":
+                bundle["hashtags"].append("#NotInBank")
+            elif breakage == "domain":
+                bundle["links"].append({"url": "https://evil.test/x"})
+            else:
+                bundle["media_suggestion"] = {"type": "gif"}
+        posts.append(bundle)
+    return posts
+
+# --- Harness ---------------------------------------------------------------
+
+@dataclass
+class Case:
+    name: str
+    # make(n) does all setup and returns a thunk performing n operations
+    make: Callable[[int], Callable[[], None]]
+    number: int
+
+def _measure(case: Case, repeat: int, scale: float) -> Dict:
+    n = max(1, int(case.number * scale))
+    samples = []
+    for _ in range(repeat):
+        thunk = case.make(n)
+        started = time.perf_counter()
+        thunk()
+        samples.append((time.perf_counter() - started) / n * 1e6)
+    return {"best_us": round(min(samples), 3), "median_us": round(statistics.median(samples), 3), "ops": n}
+
+def _cycle(items: List, n: int) -> List:
+    return [items[i % len(items)] for i in range(n)]
+
+def build_cases(workdir: str) -> List[Case]:
+    """Register the synthetic brand and return every benchmark case"""
+    cfg = synthetic_brand()
+    config_cache.put(cfg["brand"], cfg, source="local")
+    posts = synthetic_posts(cfg, 500)
+    valid_posts = synthetic_posts(cfg, 500, invalid_ratio=0.0, seed=1)
+    plan_rules = cfg["caption_rules"]["Instagram"]
+    media_policy = cfg["media_policy"]["Instagram"]
+
+    def validate_case(source: List[Dict], replay: bool = False):
+        def make(n):
+            bundles = _cycle(source, n)
+            result_cache.clear()
+            if replay:
+                for b in bundles:
+                    validator.validate(b)
+            return lambda: [validator.validate(b) for b in bundles]
+        return make
+
+    def call_each(func, args_list):
+        def make(n):
+            calls = _cycle(args_list, n)
+            return lambda: [func(*a) for a in calls]
+        return make
+
+    def generate(seed=None):
+        def make(n):
+            base = {"caption": "Refurbished phones with quality guaranteed. Trade in today.",
+                    "media_suggestion": {"type": "image"}}
+            return lambda: [content_generator.generate_variations(base, cfg["brand"], PLATFORMS[i % 4], 3, seed)
+                            for i in range(n)]
+        return make
+
+    def generate_compliant(n):
+        base = {"caption": "Refurbished phones with quality guaranteed. Trade in today.",
+                "media_suggestion": {"type": "image"}}
+        return lambda: [content_generator.generate_compliant_variations(base, cfg["brand"], PLATFORMS[i % 4], 3)
+                        for i in range(n)]
+
+    def sheets_conversion(rows):
+        def make(n):
+            import pandas as pd
+            from bench_sheets_conversion import synthetic_tab
+            from google_sheets_service import GoogleSheetsService
+            data = synthetic_tab(rows)
+            df = pd.DataFrame(data[1:], columns=data[0])
+            service = GoogleSheetsService.__new__(GoogleSheetsService)
+            return lambda: [service._dataframe_to_config(df, "Amar") for _ in range(n)]
+        return make
+
+    def excel_convert(n):
+        from sheet_to_brand_json import BrandConfigConverter
+        out_dir = os.path.join(workdir, "converted")
+
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(n):
+                    BrandConfigConverter(EXCEL_FIXTURE, out_dir).convert()
+        return run
+
+    cases = [
+        Case("validate.mixed", validate_case(posts), 500),
+        Case("validate.valid", validate_case(valid_posts), 500),
+        Case("validate.replayed", validate_case(valid_posts, replay=True), 500),
+        Case("check_caption_rules", call_each(validator.check_caption_rules,
+                                              [(p["caption"], plan_rules) for p in posts]), 20000),
+        Case("check_forbidden_words", call_each(validator.check_forbidden_words,
+                                                [(p["caption"], cfg["forbidden_words"]) for p in posts]), 5000),
+        Case("check_bank", call_each(validator.check_bank,
+                                     [(p["hashtags"], cfg["hashtag_bank"][p["platform"]], "hashtag") for p in posts]), 20000),
+        Case("check_media_policy", call_each(validator.check_media_policy,
+                                             [(p["media_suggestion"], media_policy) for p in posts]), 20000),
+        Case("check_link_policy", call_each(validator.check_link_policy,
+                                            [(p["links"], cfg["link_policy"]) for p in posts]), 20000),
+        Case("sha256_of_bundle", call_each(validator.sha256_of_bundle, [(p,) for p in posts]), 20000),
+        Case("generate_variations", generate(), 500),
+        Case("generate_variations.cached", generate(seed=7), 500),
+        Case("generate_variations.compliant", generate_compliant, 500),
+        Case("dataframe_to_config.1k_rows", sheets_conversion(1000), 20),
+        Case("dataframe_to_config.50k_rows", sheets_conversion(50000), 2),
+    ]
+    if os.path.exists(EXCEL_FIXTURE):
+        cases.append(Case("converter.convert", excel_convert, 1))
+    return cases
+
+# --- Results ---------------------------------------------------------------
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def load_runs(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def save_run(path: str, run: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(run, ensure_ascii=False) + "\n")
+
+def find_baseline(runs: List[Dict], ref: str) -> Optional[Dict]:
+    """Latest saved run for ref (commit prefix, or "last" for the latest run of any commit)"""
+    for run in reversed(runs):
+        if ref == "last" or (run.get("commit") or "").startswith(ref):
+            return run
+    return None
+
+def run_suite(selected: Optional[List[str]], repeat: int, scale: float) -> Dict[str, Dict]:
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # Keep proof records out of ./proofs
+        original = proof_writer.log, proof_writer.index, proof_writer.merkle
+        proof_writer.log = ProofLog(os.path.join(workdir, "proofs"))
+        proof_writer.index = ProofIndex(log=proof_writer.log)
+        proof_writer.merkle = MerkleStore(log=proof_writer.log)
+        try:
+            for case in build_cases(workdir):
+                if selected and not any(s in case.name for s in selected):
+                    continue
+                r = _measure(case, repeat, scale)
+                results[case.name] = r
+                print(f"  {case.name:<30} {r['best_us']:>12.2f} µs/op  (median {r['median_us']:.2f}, {r['ops']} ops)")
+        finally:
+            proof_writer.shutdown()
+            proof_writer.index.close()
+            proof_writer.log, proof_writer.index, proof_writer.merkle = original
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the offline microbenchmark suite')
+    parser.add_argument('--filter', nargs='+', help='Only run cases whose name contains one of these')
+    parser.add_argument('--repeat', type=int, default=5, help='Samples per case (best and median are reported)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply the ops per sample (e.g. 0.1 for a quick run)')
+    parser.add_argument('--results', default=DEFAULT_RESULTS, help='JSONL file the runs are appended to')
+    parser.add_argument('--no-save', action='store_true', help='Do not record this run')
+    parser.add_argument('--compare', metavar='REF', help='Compare with a saved run: commit prefix, or "last" for the latest saved run')
+    parser.add_argument('--fail-over', type=float, metavar='PCT', help='Exit with status 1 if any case is more than PCT%% slower than the baseline')
+
+    args = parser.parse_args()
+
+    commit = _git("rev-parse", "HEAD")
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    print(f"🏁 Benchmarking {commit[:10] if commit else 'unknown commit'}{' (dirty)' if dirty else ''}")
+    results = run_suite(args.filter, args.repeat, args.scale)
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "dirty": dirty,
+        "python": platform_mod.python_version(),
+        "machine": platform_mod.machine(),
+        "proof_durability": proof_writer.durability,
+        "results": results,
+    }
+
+    regressions = []
+    if args.compare:
+        baseline = find_baseline(load_runs(args.results), args.compare)
+        if baseline is None:
+            print(f"⚠️ No saved run matches {args.compare!r}")
+        else:
+            print(f"\n📊 Compared with {(baseline.get('commit') or 'unknown')[:10]} ({baseline['timestamp']})")
+            for name, r in results.items():
+                before = baseline["results"].get(name)
+                if not before:
+                    print(f"  {name:<30} new")
+                    continue
+                change = (r["best_us"] / before["best_us"] - 1) * 100
+                marker = ""
+                if args.fail_over is not None and change > args.fail_over:
+                    regressions.append(name)
+                    marker = "  ❌"
+                print(f"  {name:<30} {before['best_us']:>12.2f} -> {r['best_us']:>12.2f} µs/op  {change:+7.1f}%{marker}")
+
+    if not args.no_save:
+        save_run(args.results, run)
+        print(f"\n✓ Saved results to {args.results}")
+
+    if regressions:
+        print(f"❌ Slower than {args.fail_over}% over baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Prebuilt brand summary index for GET /brands
+"""
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+SUMMARY_FIELDS = ["name", "voice", "story", "platforms", "hashtag_banks", "cta_banks",
+                  "media_policy", "forbidden_words", "allowed_domains"]
+
+@dataclass
+class RenderedPage:
+    body: bytes
+    gzip_body: bytes
+    etag: str
+
+@dataclass
+class BrandIndexSnapshot:
+    entries: List[Dict]
+    signature: Tuple
+    version: str
+    pages: Dict[Tuple, RenderedPage] = field(default_factory=dict)
+
+def _summary(cfg: Dict, brand_name: str) -> Dict:
+    return {
+        "name": cfg.get("brand", brand_name),
+        "voice": cfg.get("voice", {}),
+        "story": cfg.get("story", ""),
+        "platforms": cfg.get("platforms", []),
+        "hashtag_banks": cfg.get("hashtag_bank", {}),
+        "cta_banks": cfg.get("cta_bank", {}),
+        "media_policy": cfg.get("media_policy", {}),
+        "forbidden_words": cfg.get("forbidden_words", []),
+        "allowed_domains": cfg.get("link_policy", {}).get("allowed_domains", [])
+    }
+
+class BrandIndex:
+    def __init__(self, config_dir: str = "config", check_interval: Optional[float] = None, max_pages: int = 64):
+        """
+        Initialize the brand index
+
+        Args:
+            config_dir: Directory holding per-brand JSON configs
+            check_interval: Minimum seconds between scans for changed config files
+            max_pages: Rendered (fields, offset, limit) variants kept per index version
+        """
+        self.config_dir = config_dir
+        self.check_interval = check_interval if check_interval is not None else float(os.getenv("BRAND_INDEX_CHECK_INTERVAL", "2"))
+        self.max_pages = max_pages
+        self.snapshot: Optional[BrandIndexSnapshot] = None
+        self.rebuilds = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def _config_files(self) -> List[os.DirEntry]:
+        if not os.path.exists(self.config_dir):
+            return []
+        return sorted(
+            (e for e in os.scandir(self.config_dir) if e.name.endswith('.json') and e.name != 'multibrand.json'),
+            key=lambda e: e.name
+        )
+
+    def _build(self, files: List[os.DirEntry], signature: Tuple) -> BrandIndexSnapshot:
+        entries = []
+        for e in files:
+            brand_name = e.name.replace('.json', '').replace('_', ' ').title()
+            try:
+                with open(e.path, 'r') as f:
+                    entries.append(_summary(json.load(f), brand_name))
+            except Exception as ex:
+                print(f"⚠️ Skipping {e.name} in brand index: {ex}")
+        version = hashlib.sha256(json.dumps(entries, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        self.rebuilds += 1
+        return BrandIndexSnapshot(entries=entries, signature=signature, version=version)
+
+    def needs_check(self) -> bool:
+        """Whether the next lookup has to scan the config directory"""
+        return self.snapshot is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def current(self) -> BrandIndexSnapshot:
+        """The index, rebuilt only if a config file was added, removed or changed"""
+        if not self.needs_check():
+            return self.snapshot
+        with self._lock:
+            if not self.needs_check():
+                return self.snapshot
+            files = self._config_files()
+            signature = tuple((e.name, e.stat().st_mtime_ns, e.stat().st_size) for e in files)
+            if self.snapshot is None or self.snapshot.signature != signature:
+                self.snapshot = self._build(files, signature)
+            self._checked_at = time.monotonic()
+            return self.snapshot
+
+    def render(self, snapshot: BrandIndexSnapshot, fields: Optional[str] = None,
+               offset: int = 0, limit: Optional[int] = None) -> RenderedPage:
+        """
+        Serialized /brands page, cached per index version
+
+        Args:
+            snapshot: Index to render
+            fields: Comma-separated subset of SUMMARY_FIELDS (all when empty)
+            offset: First brand to include
+            limit: Maximum brands to include (all when None)
+
+        Raises:
+            ValueError: Unknown field requested
+        """
+        selected = tuple(f.strip() for f in fields.split(",") if f.strip()) if fields else ()
+        unknown = [f for f in selected if f not in SUMMARY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(SUMMARY_FIELDS)}")
+
+        key = (selected, offset, limit)
+        page = snapshot.pages.get(key)
+        if page is not None:
+            return page
+
+        entries = snapshot.entries[offset:offset + limit if limit is not None else None]
+        if selected:
+            entries = [{f: e[f] for f in selected} for e in entries]
+        body = json.dumps({
+            "brands": entries,
+            "total": len(snapshot.entries),
+            "offset": offset,
+            "limit": limit
+        }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        etag = '"' + hashlib.sha256(snapshot.version.encode("utf-8") + repr(key).encode("utf-8")).hexdigest()[:32] + '"'
+        page = RenderedPage(body=body, gzip_body=gzip.compress(body, mtime=0), etag=etag)
+
+        if len(snapshot.pages) >= self.max_pages:
+            snapshot.pages.clear()
+        snapshot.pages[key] = page
+        return page
+
+# Global instance
+brand_index = BrandIndex()
@@ -0,0 +1,84 @@
+"""
+Canonical hashing of bundles
+
+A bundle's digest is the sha256 of json.dumps(bundle, sort_keys=True,
+ensure_ascii=False) in UTF-8; proofs already written depend on exactly those
+bytes. Encoder backends produce them as a sequence of byte chunks that are fed
+straight into the hash object. The default "json" backend calls the stdlib C
+encoder directly: json.dumps and JSONEncoder.encode set up a new one on every
+call, which is most of their cost on bundle-sized objects.
+
+Other backends can be added with register_backend(); they must emit the same
+bytes (test_canonical_hash.py checks every registered backend).
+"""
+import os
+import json
+import hashlib
+from json.encoder import c_make_encoder, encode_basestring
+from typing import Any, Callable, Dict, Iterable, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+Encoder = Callable[[Any], Iterable[bytes]]
+
+_json_encoder = json.JSONEncoder(sort_keys=True, ensure_ascii=False)
+
+if c_make_encoder is not None:
+    # Same arguments JSONEncoder.iterencode passes for a one-shot encode. No
+    # circular-reference markers: they would be shared between threads, and
+    # bundles are parsed JSON, which cannot be circular.
+    _c_encode = c_make_encoder(None, _json_encoder.default, encode_basestring, None,
+                               _json_encoder.key_separator, _json_encoder.item_separator,
+                               True, False, True)
+
+    def _encode_json(obj: Any) -> Iterable[bytes]:
+        return ("".join(_c_encode(obj, 0)).encode("utf-8"),)
+else:
+    def _encode_json(obj: Any) -> Iterable[bytes]:
+        return (_json_encoder.encode(obj).encode("utf-8"),)
+
+_BACKENDS: Dict[str, Encoder] = {
+    "json": _encode_json,
+}
+
+def register_backend(name: str, encoder: Encoder):
+    """
+    Add an encoder backend
+
+    Args:
+        name: Name to select it by (CANONICAL_HASH_BACKEND or CanonicalHasher(backend=...))
+        encoder: Callable returning the canonical UTF-8 bytes of an object as chunks
+    """
+    _BACKENDS[name] = encoder
+
+def backends() -> Dict[str, Encoder]:
+    """Registered backends by name"""
+    return dict(_BACKENDS)
+
+class CanonicalHasher:
+    def __init__(self, backend: Optional[str] = None):
+        """
+        Initialize the hasher
+
+        Args:
+            backend: Encoder backend name (defaults to CANONICAL_HASH_BACKEND or "json")
+
+        Raises:
+            ValueError: Unknown backend
+        """
+        self.backend = backend or os.getenv("CANONICAL_HASH_BACKEND", "json")
+        if self.backend not in _BACKENDS:
+            raise ValueError(f"Unknown canonical hash backend {self.backend!r}; registered: {sorted(_BACKENDS)}")
+        self._encode = _BACKENDS[self.backend]
+
+    def hexdigest(self, obj: Any) -> str:
+        """sha256 hex digest of the canonical encoding of obj"""
+        h = hashlib.sha256()
+        for chunk in self._encode(obj):
+            h.update(chunk)
+        return h.hexdigest()
+
+# Global instance
+canonical_hasher = CanonicalHasher()
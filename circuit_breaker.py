@@ -0,0 +1,121 @@
+"""
+Circuit breaker for calls to flaky upstream services
+"""
+import os
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional, Tuple, Type
+from dotenv import load_dotenv
+from google_sheets_service import BrandNotInSheetError
+
+# Load environment variables
+load_dotenv()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open"""
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0,
+                 excluded_exceptions: Tuple[Type[BaseException], ...] = ()):
+        """
+        Initialize the circuit breaker
+
+        Args:
+            name: Name used in logs and stats
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a half-open probe
+            excluded_exceptions: Exceptions that prove the upstream answered and
+                so do not count as failures
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.excluded_exceptions = excluded_exceptions
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.rejected = 0
+        self.transitions: deque = deque(maxlen=50)
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        print(f"🔌 Circuit {self.name}: {self.state} -> {state}")
+        self.transitions.append({"from": self.state, "to": state, "at": time.time()})
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now (claims the probe when half-open)"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call func through the breaker
+
+        Raises:
+            CircuitOpenError: The circuit is open and func was not called
+        """
+        if not self.allow():
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            result = func(*args, **kwargs)
+        except self.excluded_exceptions:
+            self.record_success()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> Dict:
+        """Current state, counters and recent transitions"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout_seconds": self.reset_timeout,
+                "rejected": self.rejected,
+                "transitions": list(self.transitions),
+            }
+
+# Global instance guarding Google Sheets config lookups
+sheets_breaker = CircuitBreaker(
+    "google_sheets",
+    failure_threshold=int(os.getenv("SHEETS_BREAKER_FAILURES", "3")),
+    reset_timeout=float(os.getenv("SHEETS_BREAKER_RESET_SECONDS", "30")),
+    excluded_exceptions=(BrandNotInSheetError,),
+)
@@ -0,0 +1,154 @@
+"""
+In-process cache for brand configurations
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+@dataclass
+class CachedConfig:
+    config: Dict
+    source: str
+    version: str
+    loaded_at: float
+    path: Optional[str] = None
+    mtime_ns: Optional[int] = None
+    checked_at: float = 0.0
+    # Local config served because Google Sheets failed; expires like a Sheets entry
+    fallback: bool = False
+
+def config_version(config: Dict) -> str:
+    """Stable content version of a brand config (same content -> same version)"""
+    data = json.dumps(config, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def _file_mtime_ns(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+class ConfigCache:
+    def __init__(self, max_entries: Optional[int] = None, sheets_ttl: Optional[float] = None,
+                 stat_interval: Optional[float] = None):
+        """
+        Initialize the config cache
+
+        Args:
+            max_entries: LRU bound on cached brands
+            sheets_ttl: Seconds a Google Sheets config stays fresh
+            stat_interval: Minimum seconds between mtime checks of a local config file
+        """
+        self.max_entries = max_entries or int(os.getenv("CONFIG_CACHE_MAX_ENTRIES", "64"))
+        self.sheets_ttl = sheets_ttl if sheets_ttl is not None else float(os.getenv("CONFIG_CACHE_SHEETS_TTL", "300"))
+        self.stat_interval = stat_interval if stat_interval is not None else float(os.getenv("CONFIG_CACHE_STAT_INTERVAL", "2"))
+        self._entries: "OrderedDict[str, CachedConfig]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(brand: str) -> str:
+        return brand.lower().replace(" ", "")
+
+    def _is_fresh(self, entry: CachedConfig, now: float) -> bool:
+        if entry.source == "sheets" or entry.fallback:
+            if now - entry.loaded_at >= self.sheets_ttl:
+                return False
+            if entry.source == "sheets":
+                return True
+        if entry.path is None:
+            return True
+        # Only stat the file once per interval so the hot path stays off disk
+        if now - entry.checked_at < self.stat_interval:
+            return True
+        entry.checked_at = now
+        return _file_mtime_ns(entry.path) == entry.mtime_ns
+
+    def get_entry(self, brand: str) -> Optional[CachedConfig]:
+        """Return the cached entry for a brand, or None if missing or stale"""
+        key = self._key(brand)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._is_fresh(entry, now):
+                del self._entries[key]
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, brand: str, config: Dict, source: str, path: Optional[str] = None,
+            fallback: bool = False) -> CachedConfig:
+        """
+        Store a freshly loaded config
+
+        Args:
+            brand: Brand name
+            config: Parsed brand configuration (shared, callers must not mutate it)
+            source: "sheets" or "local"
+            path: Local file the config was read from, used for mtime invalidation
+            fallback: A local config standing in for Google Sheets; it expires after
+                sheets_ttl so Sheets (and its circuit breaker) is consulted again
+        """
+        now = time.monotonic()
+        entry = CachedConfig(
+            config=config,
+            source=source,
+            version=config_version(config),
+            loaded_at=now,
+            path=path,
+            mtime_ns=_file_mtime_ns(path) if path else None,
+            checked_at=now,
+            fallback=fallback,
+        )
+        key = self._key(brand)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, brand: Optional[str] = None):
+        """Drop one brand, or every brand when no name is given"""
+        with self._lock:
+            if brand is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+            elif self._entries.pop(self._key(brand), None) is not None:
+                self.invalidations += 1
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "versions": {k: e.version for k, e in self._entries.items()},
+            }
+
+# Global instance
+config_cache = ConfigCache()
@@ -0,0 +1,157 @@
+"""
+Binary snapshot of every local brand config
+
+sheet_to_brand_json.py writes config/brands.snapshot next to the per-brand
+JSON files. The server reads it once at startup and serves local configs
+from it; anything that does not check out falls back to the JSON files.
+
+Layout: fixed header (magic, schema version, Python version, payload length,
+sha256 of payload) followed by a marshal payload. Configs only hold JSON
+types, which marshal handles without running any code on load.
+"""
+import os
+import sys
+import time
+import struct
+import marshal
+import hashlib
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MAGIC = b"MBGVCFG\x00"
+SCHEMA_VERSION = 1
+SNAPSHOT_FILENAME = "brands.snapshot"
+_HEADER = struct.Struct(">8sHBBQ32s")
+
+def _brand_key(brand: str) -> str:
+    return brand.lower().replace(' ', '')
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def write_snapshot(configs: Dict[str, Dict], config_dir: str, path: Optional[str] = None) -> str:
+    """
+    Write the binary snapshot for configs already saved as JSON in config_dir
+
+    Each brand records the mtime/size of its JSON file, so a JSON edited after
+    the snapshot was built is served from the JSON instead.
+
+    Args:
+        configs: Brand name -> config, as saved by the converter
+        config_dir: Directory holding <brand>.json files
+        path: Snapshot path (defaults to <config_dir>/brands.snapshot)
+
+    Returns:
+        Path of the snapshot
+    """
+    path = path or os.path.join(config_dir, SNAPSHOT_FILENAME)
+    brands = {}
+    for brand, cfg in configs.items():
+        filename = f"{_brand_key(brand)}.json"
+        brands[_brand_key(brand)] = {
+            "file": filename,
+            "stamp": _file_stamp(os.path.join(config_dir, filename)),
+            "config": cfg,
+        }
+    payload = marshal.dumps({"created_at": time.time(), "brands": brands})
+    header = _HEADER.pack(MAGIC, SCHEMA_VERSION, sys.version_info[0], sys.version_info[1],
+                          len(payload), hashlib.sha256(payload).digest())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header + payload)
+    os.replace(tmp_path, path)
+    return path
+
+def read_snapshot(path: str) -> Dict:
+    """
+    Read and verify a snapshot in one read
+
+    Raises:
+        ValueError: Wrong magic, schema or Python version, truncated file or bad checksum
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError("snapshot truncated")
+    magic, schema, py_major, py_minor, length, digest = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("not a brand config snapshot")
+    if schema != SCHEMA_VERSION:
+        raise ValueError(f"schema version {schema}, expected {SCHEMA_VERSION}")
+    if (py_major, py_minor) != sys.version_info[:2]:
+        raise ValueError(f"written by Python {py_major}.{py_minor}, running {sys.version_info[0]}.{sys.version_info[1]}")
+    payload = data[_HEADER.size:]
+    if len(payload) != length:
+        raise ValueError("snapshot truncated")
+    if hashlib.sha256(payload).digest() != digest:
+        raise ValueError("checksum mismatch")
+    return marshal.loads(payload)
+
+class LocalConfigSnapshot:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Initialize the snapshot holder
+
+        Args:
+            path: Snapshot file (defaults to CONFIG_SNAPSHOT_PATH or config/brands.snapshot)
+        """
+        self.path = path or os.getenv("CONFIG_SNAPSHOT_PATH", os.path.join("config", SNAPSHOT_FILENAME))
+        self._brands: Dict[str, Dict] = {}
+        self.loaded_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.hits = 0
+        self.stale = 0
+
+    def load(self) -> bool:
+        """Load the snapshot; on any problem keep serving JSON files and remember why"""
+        if not os.path.exists(self.path):
+            self.error = "missing"
+            return False
+        try:
+            snapshot = read_snapshot(self.path)
+        except Exception as e:
+            self.error = str(e)
+            print(f"⚠️ Ignoring config snapshot {self.path}: {e}")
+            return False
+        self._brands = snapshot["brands"]
+        self.loaded_at = time.time()
+        self.error = None
+        print(f"✅ Loaded {len(self._brands)} brand configs from {self.path}")
+        return True
+
+    def get(self, brand: str) -> Optional[Tuple[Dict, str]]:
+        """
+        (config, JSON path) for a brand, or None if absent or its JSON changed since
+
+        The returned config is shared; callers must not mutate it.
+        """
+        entry = self._brands.get(_brand_key(brand))
+        if entry is None:
+            return None
+        json_path = os.path.join(os.path.dirname(self.path), entry["file"])
+        stamp = entry["stamp"]
+        if stamp is None or _file_stamp(json_path) != tuple(stamp):
+            self.stale += 1
+            return None
+        self.hits += 1
+        return entry["config"], json_path
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "loaded": self.loaded_at is not None,
+            "brands": len(self._brands),
+            "error": self.error,
+            "hits": self.hits,
+            "stale": self.stale,
+        }
+
+# Global instance
+local_snapshot = LocalConfigSnapshot()
@@ -1,9 +1,33 @@
+import os
 import random
-from typing import List, Dict, Any
-from validator import load_brand_config
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Hashable, Optional
+from dotenv import load_dotenv
+from validator import load_brand_config, get_config_version, get_validation_plan
+from validation_plan import ValidationPlan
+from canonical_hash import canonical_hasher
+from metrics import variation_candidates
+
+# Load environment variables
+load_dotenv()
+
+# Validation errors caused by the request rather than by generated text
+_INPUT_ERRORS = ("PLATFORM_NOT_ENABLED:", "MEDIA_TYPE_NOT_ALLOWED:", "CAROUSEL_COUNT_INVALID:", "LINK_DOMAIN_NOT_ALLOWED:")
 
 class ContentVariationGenerator:
-    def __init__(self):
+    def __init__(self, max_cached: Optional[int] = None):
+        """
+        Initialize the generator
+
+        Args:
+            max_cached: LRU bound on cached generate_variations results
+        """
+        self.max_cached = max_cached or int(os.getenv("VARIATION_CACHE_MAX_ENTRIES", "1024"))
+        self._cache: "OrderedDict[Hashable, List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.tone_variations = {
             'professional': {
                 'starters': ['We are pleased to announce', 'Our team is excited to share', 'We are proud to present'],
@@ -42,9 +66,130 @@ class ContentVariationGenerator:
             }
         }
 
-    def generate_variations(self, base_content: Dict, brand: str, platform: str, count: int = 3) -> List[Dict]:
-        """Generate multiple variations of content"""
+    def generate_variations(self, base_content: Dict, brand: str, platform: str, count: int = 3,
+                            seed: Optional[int] = None) -> List[Dict]:
+        """
+        Generate multiple variations of content
+
+        Args:
+            seed: Seed for this request's RNG; the same seed, input and brand config
+                give the same variations, served from the cache after the first call
+
+        Returns:
+            Variations (cached results are shared, do not mutate)
+        """
+        if seed is None:
+            return self._generate(base_content, load_brand_config(brand), platform, count, random.Random())
+        return self._cached(
+            ("variations", canonical_hasher.hexdigest(base_content), brand, get_config_version(brand), platform, count, seed),
+            lambda: self._generate(base_content, load_brand_config(brand), platform, count, random.Random(seed)))
+
+    def generate_compliant_variations(self, base_content: Dict, brand: str, platform: str, count: int = 3,
+                                      seed: Optional[int] = None, max_attempts: int = 5) -> Dict:
+        """
+        Generate variations that pass the brand's validation rules
+
+        Every candidate runs through the brand/platform validation plan in-process.
+        Candidates draw hashtags and CTAs only from the brand's banks and keep
+        captions within its max_chars; one that still fails (e.g. a forbidden
+        word in the generated caption) is resampled with the next tone, up to
+        max_attempts per variation. Errors that come from the request itself
+        (platform not enabled, media type, link domains) stop generation early,
+        since no resample can fix them.
+
+        Args:
+            seed: As for generate_variations
+            max_attempts: Candidates tried per variation
+
+        Returns:
+            {"variations": compliant variations only, "results": per-variation
+            validation results, "candidates": candidates generated}; cached
+            results are shared, do not mutate
+        """
+        if seed is None:
+            return self._generate_compliant(base_content, brand, platform, count, max_attempts, random.Random())
+        # The plan is compiled from this version, so it covers the rules as well
+        return self._cached(
+            ("compliant", canonical_hasher.hexdigest(base_content), brand, get_config_version(brand), platform, count,
+             seed, max_attempts),
+            lambda: self._generate_compliant(base_content, brand, platform, count, max_attempts, random.Random(seed)))
+
+    def _cached(self, key: Hashable, build):
+        # Callers compute the config version before loading the config: if it changes
+        # in between, the result lands under the old version, which is never asked for again
+        with self._cache_lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+        result = build()
+        with self._cache_lock:
+            self._cache[key] = result
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return result
+
+    def _generate_compliant(self, base_content: Dict, brand: str, platform: str, count: int, max_attempts: int,
+                            rng: random.Random) -> Dict:
         brand_config = load_brand_config(brand)
+        plan = get_validation_plan(brand, platform)
+        voice = brand_config.get('voice', {})
+        # Sorted so a seed picks the same tags whatever the set's iteration order
+        hashtag_bank = sorted(plan.hashtag_bank)
+        cta_bank = sorted(plan.cta_bank)
+
+        variations, results = [], []
+        candidates = 0
+        unfixable: List[str] = []
+        for i in range(count):
+            variation_id = f"var_{i + 1}"
+            if unfixable:
+                results.append({"variation_id": variation_id, "valid": False, "attempts": 0,
+                                "errors": unfixable, "rejected": []})
+                continue
+            rejected = []
+            for attempt in range(max_attempts):
+                # Resamples move on to the next tone as well as redrawing the wording
+                candidate = self._create_variation(base_content, voice, hashtag_bank, cta_bank, platform,
+                                                   i + attempt, rng, plan)
+                bundle = {
+                    "brand": plan.brand,
+                    "platform": platform,
+                    "caption": candidate["caption"],
+                    "hashtags": candidate["hashtags"],
+                    "cta": candidate["cta"],
+                    "media_suggestion": candidate["media_suggestion"],
+                    "links": base_content.get("links", []),
+                    "week": base_content.get("week"),
+                }
+                errors, _ = plan.run(bundle)
+                candidates += 1
+                if not errors:
+                    break
+                rejected.append({"tone": candidate["tone"], "errors": errors})
+                # Platform, media and links come from the request, so no resample can fix them
+                fixed = [e for e in errors if e.startswith(_INPUT_ERRORS)]
+                if fixed:
+                    unfixable = fixed
+                    break
+            if errors:
+                variation_candidates.inc("rejected", amount=len(rejected))
+                results.append({"variation_id": variation_id, "valid": False, "attempts": len(rejected),
+                                "errors": errors, "rejected": rejected})
+                continue
+            variation_candidates.inc("accepted")
+            if rejected:
+                variation_candidates.inc("rejected", amount=len(rejected))
+            candidate["variation_id"] = variation_id
+            variations.append(candidate)
+            results.append({"variation_id": variation_id, "valid": True, "attempts": len(rejected) + 1,
+                            "errors": [], "rejected": rejected})
+        return {"variations": variations, "results": results, "candidates": candidates}
+
+    def _generate(self, base_content: Dict, brand_config: Dict, platform: str, count: int,
+                  rng: random.Random) -> List[Dict]:
         variations = []
         
         # Get brand-specific data
@@ -60,26 +205,39 @@ class ContentVariationGenerator:
                 hashtag_bank, 
                 cta_bank, 
                 platform, 
-                i
+                i,
+                rng
             )
             variations.append(variation)
         
         return variations
 
-    def _create_variation(self, base_content: Dict, voice: Dict, hashtags: List, ctas: List, platform: str, variation_index: int) -> Dict:
+    def cache_stats(self) -> Dict:
+        with self._cache_lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.max_cached,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _create_variation(self, base_content: Dict, voice: Dict, hashtags: List, ctas: List, platform: str, variation_index: int,
+                          rng: random.Random, plan: Optional[ValidationPlan] = None) -> Dict:
         """Create a single variation"""
         
         # Determine tone based on brand voice and variation index
         tone = self._select_tone(voice, variation_index)
         
         # Modify caption
-        caption = self._modify_caption(base_content.get('caption', ''), tone, platform)
+        caption = self._modify_caption(base_content.get('caption', ''), tone, platform, rng, plan)
         
         # Select hashtags
-        selected_hashtags = self._select_hashtags(hashtags, platform, variation_index)
+        selected_hashtags = self._select_hashtags(hashtags, platform, variation_index, rng, plan)
         
         # Select CTA
-        selected_cta = self._select_cta(ctas, tone, variation_index)
+        selected_cta = self._select_cta(ctas, tone, variation_index, rng, plan)
         
         # Modify media suggestion
         media_suggestion = self._modify_media_suggestion(base_content.get('media_suggestion', {}), platform)
@@ -110,7 +268,8 @@ class ContentVariationGenerator:
         available_tones = tone_mapping.get(brand_tone, ['professional', 'casual', 'friendly'])
         return available_tones[variation_index % len(available_tones)]
 
-    def _modify_caption(self, original_caption: str, tone: str, platform: str) -> str:
+    def _modify_caption(self, original_caption: str, tone: str, platform: str, rng: random.Random,
+                        plan: Optional[ValidationPlan] = None) -> str:
         """Modify caption based on tone and platform"""
         tone_data = self.tone_variations.get(tone, self.tone_variations['professional'])
         
@@ -119,16 +278,16 @@ class ContentVariationGenerator:
         
         # Create new caption based on tone
         if tone == 'professional':
-            caption = f"{random.choice(tone_data['starters'])} {key_info['main_message']}. {random.choice(tone_data['connectors'])} {key_info['benefit']}. {random.choice(tone_data['endings'])}."
+            caption = f"{rng.choice(tone_data['starters'])} {key_info['main_message']}. {rng.choice(tone_data['connectors'])} {key_info['benefit']}. {rng.choice(tone_data['endings'])}."
         elif tone == 'casual':
-            caption = f"{random.choice(tone_data['starters'])} {key_info['main_message']}! {random.choice(tone_data['connectors'])} {key_info['benefit']}. {random.choice(tone_data['endings'])}"
+            caption = f"{rng.choice(tone_data['starters'])} {key_info['main_message']}! {rng.choice(tone_data['connectors'])} {key_info['benefit']}. {rng.choice(tone_data['endings'])}"
         elif tone == 'urgent':
-            caption = f"{random.choice(tone_data['starters'])} {key_info['main_message']}! {random.choice(tone_data['connectors'])} {key_info['benefit']}. {random.choice(tone_data['endings'])}"
+            caption = f"{rng.choice(tone_data['starters'])} {key_info['main_message']}! {rng.choice(tone_data['connectors'])} {key_info['benefit']}. {rng.choice(tone_data['endings'])}"
         else:  # friendly
-            caption = f"{random.choice(tone_data['starters'])} {key_info['main_message']}! {random.choice(tone_data['connectors'])} {key_info['benefit']}. {random.choice(tone_data['endings'])}"
+            caption = f"{rng.choice(tone_data['starters'])} {key_info['main_message']}! {rng.choice(tone_data['connectors'])} {key_info['benefit']}. {rng.choice(tone_data['endings'])}"
         
         # Adjust for platform
-        caption = self._adjust_for_platform(caption, platform)
+        caption = self._adjust_for_platform(caption, platform, plan.max_chars if plan else None)
         
         return caption
 
@@ -141,7 +300,8 @@ class ContentVariationGenerator:
             'product': 'refurbished phones' if 'phone' in caption.lower() else 'products'
         }
 
-    def _select_hashtags(self, hashtags: List[str], platform: str, variation_index: int) -> List[str]:
+    def _select_hashtags(self, hashtags: List[str], platform: str, variation_index: int, rng: random.Random,
+                         plan: Optional[ValidationPlan] = None) -> List[str]:
         """Select appropriate hashtags for variation"""
         selected = []
         
@@ -153,7 +313,7 @@ class ContentVariationGenerator:
         else:
             # Select 3-5 hashtags based on variation
             count = min(5, max(3, len(hashtags)))
-            selected = random.sample(hashtags, min(count, len(hashtags)))
+            selected = rng.sample(hashtags, min(count, len(hashtags)))
         
         # Add platform-specific hashtags
         platform_hashtags = {
@@ -164,11 +324,16 @@ class ContentVariationGenerator:
         }
         
         if platform in platform_hashtags:
-            selected.extend(platform_hashtags[platform][:2])
+            extra = platform_hashtags[platform][:2]
+            if plan and plan.hashtag_bank:
+                # Only tags the brand allows
+                extra = [h for h in extra if h in plan.hashtag_bank and h not in selected]
+            selected.extend(extra)
         
         return selected[:5]  # Limit to 5 hashtags
 
-    def _select_cta(self, ctas: List[str], tone: str, variation_index: int) -> str:
+    def _select_cta(self, ctas: List[str], tone: str, variation_index: int, rng: random.Random,
+                    plan: Optional[ValidationPlan] = None) -> str:
         """Select appropriate CTA for variation"""
         if not ctas:
             return 'Learn more'
@@ -182,7 +347,10 @@ class ContentVariationGenerator:
         }
         
         available_ctas = tone_ctas.get(tone, ctas)
-        return random.choice(available_ctas) if available_ctas else ctas[0]
+        if plan and plan.cta_bank:
+            # The tone's CTAs the brand allows, else any CTA it allows
+            available_ctas = [c for c in available_ctas if c in plan.cta_bank] or ctas
+        return rng.choice(available_ctas) if available_ctas else ctas[0]
 
     def _modify_media_suggestion(self, media_suggestion: Dict, platform: str) -> Dict:
         """Modify media suggestion for platform"""
@@ -200,8 +368,8 @@ class ContentVariationGenerator:
         
         return modified
 
-    def _adjust_for_platform(self, caption: str, platform: str) -> str:
-        """Adjust caption length and style for platform"""
+    def _adjust_for_platform(self, caption: str, platform: str, max_chars: Optional[int] = None) -> str:
+        """Adjust caption length and style for platform (and the brand's max_chars, if given)"""
         max_lengths = {
             'Instagram': 2200,
             'LinkedIn': 3000,
@@ -210,6 +378,8 @@ class ContentVariationGenerator:
         }
         
         max_length = max_lengths.get(platform, 2200)
+        if max_chars is not None:
+            max_length = min(max_length, max_chars)
         
         if len(caption) > max_length:
             caption = caption[:max_length-3] + '...'
@@ -0,0 +1,106 @@
+"""
+Aho-Corasick matcher for brand forbidden words
+"""
+from collections import deque
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+class ForbiddenHit(NamedTuple):
+    start: int
+    end: int
+    word: str
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+class ForbiddenWordMatcher:
+    def __init__(self, words: List[str]):
+        """
+        Compile a forbidden-word list into a multi-pattern automaton
+
+        Args:
+            words: Forbidden words/phrases, matched case-insensitively. Empty
+                entries are ignored.
+        """
+        self.words = list(words)
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+        self._lengths = [len(w.lower()) for w in self.words]
+
+        for idx, word in enumerate(self.words):
+            pattern = word.lower()
+            if not pattern:
+                continue
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._out[state].append(idx)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _at_boundary(self, text: str, start: int, end: int) -> bool:
+        if start > 0 and _is_word_char(text[start]) and _is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+            return False
+        return True
+
+    def find_all(self, text: str, word_boundary: bool = False) -> List[ForbiddenHit]:
+        """
+        Scan text once and report every hit
+
+        Args:
+            text: Text to scan
+            word_boundary: Only accept hits not embedded in a longer word
+
+        Returns:
+            Hits in order of end offset. Offsets index into text.lower(), which
+            matches text for everything but a few special-cased characters.
+        """
+        low = text.lower()
+        goto, fail, out, lengths = self._goto, self._fail, self._out, self._lengths
+        hits = []
+        state = 0
+        for i, ch in enumerate(low):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                end = i + 1
+                for idx in out[state]:
+                    start = end - lengths[idx]
+                    if word_boundary and not self._at_boundary(low, start, end):
+                        continue
+                    hits.append(ForbiddenHit(start, end, self.words[idx]))
+        return hits
+
+    def matched_words(self, text: str, word_boundary: bool = False) -> List[str]:
+        """Forbidden words found in text, once each, in word-list order"""
+        found = {hit.word for hit in self.find_all(text, word_boundary)}
+        return [w for w in self.words if w in found]
+
+@lru_cache(maxsize=256)
+def _compile(words: Tuple[str, ...]) -> ForbiddenWordMatcher:
+    return ForbiddenWordMatcher(list(words))
+
+def get_matcher(words: List[str]) -> ForbiddenWordMatcher:
+    """Compiled matcher for a word list; brands with the same list share one"""
+    return _compile(tuple(words))
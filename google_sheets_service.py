@@ -3,16 +3,44 @@ Google Sheets Service for Dynamic Brand Configuration
 """
 import os
 import json
-from typing import Dict, List, Optional
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import pandas as pd
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional
 from dotenv import load_dotenv
+from metrics import sheets_call_seconds, sheets_call_errors
+
+# pandas and the Google API client are imported on first use: deployments that
+# only serve local JSON configs never load them
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Load environment variables
 load_dotenv()
 
+# Tabs that never hold a brand
+SYSTEM_SHEETS = ['instructions', 'template', 'readme']
+
+class BrandNotInSheetError(Exception):
+    """The spreadsheet answered but has no tab for the brand"""
+
+def _brand_key(name: str) -> str:
+    return name.lower().replace(' ', '')
+
+def _quote_sheet(name: str) -> str:
+    # A1 notation needs quotes around tab names with spaces or punctuation
+    return "'" + name.replace("'", "''") + "'"
+
+@dataclass
+class SheetsSnapshot:
+    configs: Dict[str, Dict] = field(default_factory=dict)
+    index: Dict[str, str] = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    def get(self, brand_name: str) -> Optional[Dict]:
+        title = self.index.get(_brand_key(brand_name))
+        return self.configs.get(title) if title else None
+
 class GoogleSheetsService:
     def __init__(self, credentials_path: Optional[str] = None):
         """
@@ -23,13 +51,39 @@ class GoogleSheetsService:
         """
         self.credentials_path = credentials_path or os.getenv('GOOGLE_CREDENTIALS_PATH')
         self.spreadsheet_id = os.getenv('GOOGLE_SHEET_ID')
-        
-        if self.credentials_path and self.spreadsheet_id:
-            self._initialize_service()
+        self._service = None
+        self._service_initialized = False
+        self._service_lock = threading.Lock()
+        self.snapshot_ttl = float(os.getenv('SHEETS_SNAPSHOT_TTL', '300'))
+        self._snapshot: Optional[SheetsSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+        self.refresh_interval = float(os.getenv('SHEETS_REFRESH_INTERVAL', str(self.snapshot_ttl)))
+        self._refresher: Optional[threading.Thread] = None
+        self._refresher_stop = threading.Event()
+        self.refresh_count = 0
+        self.refresh_failures = 0
+        self.consecutive_failures = 0
+        self.last_refresh_attempt: Optional[float] = None
+        self.last_refresh_duration_ms: Optional[float] = None
+        self.last_refresh_error: Optional[str] = None
+    
+    @property
+    def service(self):
+        """Sheets API client, built on first access (None if not configured or init failed)"""
+        if not self._service_initialized:
+            with self._service_lock:
+                if not self._service_initialized:
+                    if self.credentials_path and self.spreadsheet_id:
+                        self._initialize_service()
+                    self._service_initialized = True
+        return self._service
     
     def _initialize_service(self):
         """Initialize Google Sheets API service"""
         try:
+            from google.oauth2 import service_account
+            from googleapiclient.discovery import build
+            
             # Try to get credentials from environment variable first
             credentials_json = os.getenv('GOOGLE_CREDENTIALS_JSON')
             
@@ -52,11 +106,22 @@ class GoogleSheetsService:
             else:
                 raise Exception("No credentials found in environment or file")
             
-            self.service = build('sheets', 'v4', credentials=credentials)
+            self._service = build('sheets', 'v4', credentials=credentials)
             
         except Exception as e:
             print(f"❌ Failed to initialize Google Sheets service: {e}")
-            self.service = None
+            self._service = None
+    
+    def _execute(self, call: str, request):
+        """Execute a Sheets API request, recording its latency and failures"""
+        started = time.perf_counter()
+        try:
+            return request.execute()
+        except Exception:
+            sheets_call_errors.inc(call)
+            raise
+        finally:
+            sheets_call_seconds.observe(time.perf_counter() - started, call)
     
     def get_sheet_data(self, sheet_name: str, range_name: str = None) -> List[List]:
         """
@@ -72,16 +137,17 @@ class GoogleSheetsService:
         if not self.service:
             raise Exception("Google Sheets service not initialized")
         
+        from googleapiclient.errors import HttpError
         try:
             if range_name:
                 range_str = f"{sheet_name}!{range_name}"
             else:
                 range_str = sheet_name
             
-            result = self.service.spreadsheets().values().get(
+            result = self._execute("values.get", self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
                 range=range_str
-            ).execute()
+            ))
             
             return result.get('values', [])
         except HttpError as e:
@@ -92,38 +158,157 @@ class GoogleSheetsService:
         """
         Get brand configuration from Google Sheets
         
+        Served from the in-memory snapshot of every brand tab. Only the very
+        first lookup waits for Sheets; after that a stale snapshot keeps being
+        served while a refresh runs in the background, and the last good
+        snapshot survives failed refreshes.
+        
         Args:
             brand_name: Name of the brand (sheet tab name)
         
         Returns:
             Brand configuration dictionary
         """
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh_snapshot()
+        elif time.time() - snapshot.loaded_at >= self.snapshot_ttl:
+            self.refresh_in_background()
+        config = snapshot.get(brand_name)
+        if config is None:
+            raise BrandNotInSheetError(f"No sheet tab for brand: {brand_name}")
+        return config
+    
+    def _values_to_config(self, data: List[List], brand_name: str) -> Dict:
+        """Convert raw tab values (header row first) to a brand configuration"""
+        if not data:
+            raise Exception(f"No data found for brand: {brand_name}")
+        
+        import pandas as pd
+        
+        # Convert to DataFrame for easier processing
+        df = pd.DataFrame(data[1:], columns=data[0])  # Skip header row
+        
+        # Filter for the specific brand (handle brand name variations)
+        brand_variations = [brand_name, f"{brand_name} Markeplac", f"{brand_name} Marketplace"]
+        brand_df = df[df['Brand'].isin(brand_variations)]
+        
+        if brand_df.empty:
+            raise Exception(f"No data found for brand variations: {brand_variations}")
+        
+        # Convert to brand configuration format
+        return self._dataframe_to_config(brand_df, brand_name)
+    
+    def refresh_snapshot(self, blocking: bool = True) -> Optional[SheetsSnapshot]:
+        """
+        Reload every brand tab with one spreadsheets.values.batchGet
+        
+        The new snapshot replaces the old one in a single assignment, so
+        concurrent lookups see either the old or the new snapshot, never a mix.
+        
+        Args:
+            blocking: Wait for a refresh already in flight instead of returning
+        
+        Returns:
+            The new snapshot, or the current one if a refresh was already
+            running and blocking is False
+        """
+        if not self.service:
+            raise Exception("Google Sheets service not initialized")
+        
+        if not self._snapshot_lock.acquire(blocking=blocking):
+            return self._snapshot
         try:
-            # Get all data from the brand sheet
-            data = self.get_sheet_data(brand_name)
-            
-            if not data:
-                raise Exception(f"No data found for brand: {brand_name}")
-            
-            # Convert to DataFrame for easier processing
-            df = pd.DataFrame(data[1:], columns=data[0])  # Skip header row
-            
-            # Filter for the specific brand (handle brand name variations)
-            brand_variations = [brand_name, f"{brand_name} Markeplac", f"{brand_name} Marketplace"]
-            brand_df = df[df['Brand'].isin(brand_variations)]
-            
-            if brand_df.empty:
-                raise Exception(f"No data found for brand variations: {brand_variations}")
+            started = time.time()
+            self.last_refresh_attempt = started
+            try:
+                titles = self._list_brand_tabs()
+                result = self._execute("values.batchGet", self.service.spreadsheets().values().batchGet(
+                    spreadsheetId=self.spreadsheet_id,
+                    ranges=[_quote_sheet(t) for t in titles]
+                ))
+            except Exception as e:
+                self.refresh_failures += 1
+                self.consecutive_failures += 1
+                self.last_refresh_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Google Sheets snapshot refresh failed: {e}")
+                raise
+            finally:
+                self.last_refresh_duration_ms = round((time.time() - started) * 1000, 1)
             
-            # Convert to brand configuration format
-            config = self._dataframe_to_config(brand_df, brand_name)
-            return config
+            snapshot = SheetsSnapshot(loaded_at=time.time())
+            for title, value_range in zip(titles, result.get('valueRanges', [])):
+                try:
+                    snapshot.configs[title] = self._values_to_config(value_range.get('values', []), title)
+                    snapshot.index[_brand_key(title)] = title
+                except Exception as e:
+                    print(f"⚠️ Skipping sheet {title} in snapshot: {e}")
             
-        except Exception as e:
-            print(f"❌ Error getting config for {brand_name}: {e}")
-            raise
+            self._snapshot = snapshot
+            self.refresh_count += 1
+            self.consecutive_failures = 0
+            self.last_refresh_error = None
+            print(f"✅ Loaded {len(snapshot.configs)} brand configs from Google Sheets")
+            return snapshot
+        finally:
+            self._snapshot_lock.release()
+    
+    def refresh_in_background(self):
+        """Start a one-off refresh unless one is already in flight"""
+        if self._snapshot_lock.locked():
+            return
+        threading.Thread(target=self._safe_refresh, name="sheets-refresh", daemon=True).start()
+    
+    def _safe_refresh(self):
+        try:
+            self.refresh_snapshot(blocking=False)
+        except Exception:
+            # Already counted and logged; keep serving the last good snapshot
+            pass
+    
+    def _refresh_loop(self):
+        while not self._refresher_stop.wait(self.refresh_interval):
+            self._safe_refresh()
+    
+    def start_background_refresh(self):
+        """Warm the snapshot and keep refreshing it every SHEETS_REFRESH_INTERVAL seconds"""
+        if not self.is_available() or self._refresher is not None:
+            return
+        self._safe_refresh()
+        self._refresher_stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="sheets-refresher", daemon=True)
+        self._refresher.start()
     
-    def _dataframe_to_config(self, df: pd.DataFrame, brand_name: str) -> Dict:
+    def stop_background_refresh(self):
+        """Stop the periodic refresher"""
+        if self._refresher is None:
+            return
+        self._refresher_stop.set()
+        self._refresher.join(timeout=5)
+        self._refresher = None
+    
+    def snapshot_info(self) -> Dict:
+        """Age of the current snapshot plus refresh timing and failure counts"""
+        snapshot = self._snapshot
+        info = {
+            "loaded": snapshot is not None,
+            "background_refresh": self._refresher is not None,
+            "refresh_interval_seconds": self.refresh_interval,
+            "refreshing": self._snapshot_lock.locked(),
+            "refresh_count": self.refresh_count,
+            "refresh_failures": self.refresh_failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_refresh_attempt": self.last_refresh_attempt,
+            "last_refresh_duration_ms": self.last_refresh_duration_ms,
+            "last_refresh_error": self.last_refresh_error
+        }
+        if snapshot is not None:
+            info["brands"] = sorted(snapshot.configs)
+            info["age_seconds"] = round(time.time() - snapshot.loaded_at, 1)
+            info["stale"] = info["age_seconds"] >= self.snapshot_ttl
+        return info
+    
+    def _dataframe_to_config(self, df: "pd.DataFrame", brand_name: str) -> Dict:
         """
         Convert DataFrame to brand configuration format
         
@@ -153,56 +338,77 @@ class GoogleSheetsService:
             }
         }
         
-        # Process each row
-        for _, row in df.iterrows():
-            category = row.get('Category', '').strip()
-            platform = row.get('Platform', '').strip()
-            key = row.get('Key', '').strip()
-            value = row.get('Value', '').strip()
-            
-            if not category or not key:
-                continue
-            
-            # Process different categories
+        import pandas as pd
+        
+        # Normalise the four columns once; missing columns and empty cells become ''
+        cols = {
+            name: (df[name].fillna('').astype(str).str.strip() if name in df.columns
+                   else pd.Series('', index=df.index, dtype=object))
+            for name in ('Category', 'Platform', 'Key', 'Value')
+        }
+        keep = ((cols['Category'] != '') & (cols['Key'] != '')).to_numpy()
+        category_col = cols['Category'].to_numpy()[keep]
+        platform_col = cols['Platform'].to_numpy()[keep]
+        key_col = cols['Key'].to_numpy()[keep]
+        value_col = cols['Value'].to_numpy()[keep]
+        
+        # Row positions per category in sheet order, which also fixes the key
+        # order of the per-platform dicts
+        positions = pd.Series(category_col, dtype=object).groupby(category_col, sort=False).indices
+        for category, idx in positions.items():
+            platforms = platform_col[idx].tolist()
+            keys = key_col[idx].tolist()
+            values = value_col[idx].tolist()
             if category == 'Voice':
-                config['voice'][key.lower()] = value
+                config['voice'].update(zip((k.lower() for k in keys), values))
             elif category == 'Story':
-                config['story'] = value
+                config['story'] = values[-1]
             elif category == 'Platforms':
-                if value.lower() == 'true':
-                    config['platforms'].append(key)
+                config['platforms'] = [k for k, v in zip(keys, values) if v.lower() == 'true']
             elif category == 'Caption Rules':
                 # For caption rules, platform is in Platform column, key is the rule name
-                if platform and platform not in config['caption_rules']:
-                    config['caption_rules'][platform] = {}
-                if platform:
-                    config['caption_rules'][platform][key] = value
+                rows = [(p, k, v) for p, k, v in zip(platforms, keys, values) if p]
+                config['caption_rules'] = self._group_by_platform(*zip(*rows), as_dict=True) if rows else {}
             elif category == 'Hashtag Bank':
-                if platform not in config['hashtag_bank']:
-                    config['hashtag_bank'][platform] = []
-                config['hashtag_bank'][platform].append(value)
+                config['hashtag_bank'] = self._group_by_platform(platforms, keys, values)
             elif category == 'CTA Bank':
-                if platform not in config['cta_bank']:
-                    config['cta_bank'][platform] = []
-                config['cta_bank'][platform].append(value)
+                config['cta_bank'] = self._group_by_platform(platforms, keys, values)
             elif category == 'Media Policy':
-                if platform not in config['media_policy']:
-                    config['media_policy'][platform] = {}
-                config['media_policy'][platform][key] = value
+                config['media_policy'] = self._group_by_platform(platforms, keys, values, as_dict=True)
             elif category == 'Forbidden Words':
-                config['forbidden_words'].append(value)
+                config['forbidden_words'] = values
             elif category == 'Link Policy':
-                if key == 'allowed_domains':
-                    config['link_policy']['allowed_domains'].append(value)
+                config['link_policy']['allowed_domains'] = [v for k, v in zip(keys, values) if k == 'allowed_domains']
             elif category == 'Required Disclosures':
-                config['required_disclosures'].append(value)
+                config['required_disclosures'] = values
             elif category == 'Posting Frequency':
-                if platform not in config['posting_frequency']:
-                    config['posting_frequency'][platform] = {}
-                config['posting_frequency'][platform][key] = value
+                config['posting_frequency'] = self._group_by_platform(platforms, keys, values, as_dict=True)
         
         return config
     
+    @staticmethod
+    def _group_by_platform(platforms: List[str], keys: List[str], values: List[str], as_dict: bool = False) -> Dict:
+        """Per-platform Value lists, or Key -> Value dicts when as_dict is set"""
+        result = {}
+        if as_dict:
+            for platform, key, value in zip(platforms, keys, values):
+                result.setdefault(platform, {})[key] = value
+        else:
+            for platform, value in zip(platforms, values):
+                result.setdefault(platform, []).append(value)
+        return result
+    
+    def _list_brand_tabs(self) -> List[str]:
+        """Titles of every brand tab (one metadata call, errors propagate)"""
+        spreadsheet = self._execute("spreadsheets.get", self.service.spreadsheets().get(
+            spreadsheetId=self.spreadsheet_id,
+            fields='sheets.properties.title'
+        ))
+        
+        titles = [sheet['properties']['title'] for sheet in spreadsheet.get('sheets', [])]
+        # Skip system sheets
+        return [t for t in titles if t.lower() not in SYSTEM_SHEETS]
+    
     def get_all_brands(self) -> List[str]:
         """
         Get list of all available brand sheets
@@ -210,30 +416,21 @@ class GoogleSheetsService:
         Returns:
             List of brand names
         """
+        snapshot = self._snapshot
+        if snapshot is not None and time.time() - snapshot.loaded_at < self.snapshot_ttl:
+            return list(snapshot.configs)
         try:
-            # Get spreadsheet metadata
-            spreadsheet = self.service.spreadsheets().get(
-                spreadsheetId=self.spreadsheet_id
-            ).execute()
-            
-            sheets = spreadsheet.get('sheets', [])
-            brand_names = []
-            
-            for sheet in sheets:
-                sheet_name = sheet['properties']['title']
-                # Skip system sheets
-                if sheet_name.lower() not in ['instructions', 'template', 'readme']:
-                    brand_names.append(sheet_name)
-            
-            return brand_names
+            return self._list_brand_tabs()
             
         except Exception as e:
             print(f"❌ Error getting brand list: {e}")
             return []
     
     def is_available(self) -> bool:
-        """Check if Google Sheets service is available"""
-        return self.service is not None and self.spreadsheet_id is not None
+        """Check if Google Sheets service is available (builds the client on first call)"""
+        if not (self.credentials_path and self.spreadsheet_id):
+            return False
+        return self.service is not None
 
 # Global instance
 sheets_service = GoogleSheetsService()
@@ -0,0 +1,269 @@
+"""
+Link parsing, domain checks, UTM tagging and shortening
+
+Hosts come from urllib.parse (so ports, userinfo and scheme case no longer
+leak into the domain) and are allowed when they equal an allowed domain or
+end in "." + one, so evilamar.co.uk does not pass for amar.co.uk. Parsed
+hosts and verdicts per (host, allowed domains) are memoized in LRUs, since
+posts keep linking to the same few pages.
+
+Shortening is off unless SHORTENER_BACKEND names a registered backend and the
+brand's link_policy sets use_shortener. Short links are kept in a SQLite
+cache (SHORTLINK_CACHE_PATH), so a URL is shortened once per backend and
+domain and then served from the cache, across restarts too.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from urllib.parse import urlsplit
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+HOST_CACHE_SIZE = int(os.getenv("LINK_HOST_CACHE_SIZE", "4096"))
+
+def normalize_domain(domain: str) -> str:
+    """Allowed-domain entry as compared against hosts"""
+    return domain.strip().lower().strip(".")
+
+@lru_cache(maxsize=256)
+def allowed_domain_set(domains: Tuple[str, ...]) -> FrozenSet[str]:
+    """Normalized set of a link_policy's allowed_domains"""
+    return frozenset(normalize_domain(d) for d in domains)
+
+@lru_cache(maxsize=HOST_CACHE_SIZE)
+def parse_host(url: str) -> str:
+    """
+    Lowercased host of a URL, without scheme, userinfo or port
+
+    URLs without a scheme ("amar.co.uk/shop") are read as host + path, and
+    protocol-relative ones ("//amar.co.uk/shop") as they are.
+    Backslashes count as slashes, as they do in browsers, so
+    "https://evil.com\\@amar.co.uk" is evil.com. Returns "" when no host
+    can be found.
+    """
+    url = url.strip().replace("\\", "/")
+    if "://" not in url and not url.startswith("//"):
+        url = "//" + url
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return ""
+    return (host or "").rstrip(".")
+
+@lru_cache(maxsize=HOST_CACHE_SIZE)
+def host_allowed(host: str, allowed: FrozenSet[str]) -> bool:
+    """True if host is an allowed domain or a subdomain of one"""
+    if not host:
+        return False
+    if host in allowed:
+        return True
+    dot = host.find(".")
+    while dot != -1:
+        if host[dot + 1:] in allowed:
+            return True
+        dot = host.find(".", dot + 1)
+    return False
+
+def add_query(url: str, query: str) -> str:
+    """Append query parameters to a URL, before any #fragment"""
+    if not query:
+        return url
+    base, hash_mark, fragment = url.partition("#")
+    if "?" not in base:
+        sep = "?"
+    elif base.endswith(("?", "&")):
+        sep = ""
+    else:
+        sep = "&"
+    return f"{base}{sep}{query}{hash_mark}{fragment}"
+
+class UtmTemplate:
+    """
+    link_policy.utm_template with brand and platform filled in once per plan
+
+    Only {week} varies between bundles, so rendered strings are kept per week.
+    """
+    def __init__(self, template: str, brand: str, platform: str):
+        self.template = template
+        self._partial = template.replace("{week}", "\x00").format(
+            platform=platform.lower(), brand=brand.lower()).replace("\x00", "{week}")
+        self._by_week: Dict[str, str] = {}
+
+    def render(self, week: str) -> str:
+        utm = self._by_week.get(week)
+        if utm is None:
+            utm = self._partial.replace("{week}", week)
+            if len(self._by_week) < 128:
+                self._by_week[week] = utm
+        return utm
+
+# --- Shortener backends ------------------------------------------------------
+
+# (long URL, shortener domain) -> short URL
+Shortener = Callable[[str, str], str]
+
+_BASE62 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+def _shorten_local(url: str, domain: str) -> str:
+    """Deterministic stand-in: https://<domain>/<7 base62 chars of sha256(url)>"""
+    n = int.from_bytes(hashlib.sha256(url.encode("utf-8")).digest()[:8], "big")
+    code = []
+    for _ in range(7):
+        n, r = divmod(n, 62)
+        code.append(_BASE62[r])
+    return f"https://{domain}/{''.join(code)}"
+
+def _shorten_bitly(url: str, domain: str) -> str:
+    """Bitly v4 API; needs BITLY_TOKEN"""
+    import urllib.request
+    token = os.getenv("BITLY_TOKEN")
+    if not token:
+        raise RuntimeError("BITLY_TOKEN is not set")
+    req = urllib.request.Request(
+        "https://api-ssl.bitly.com/v4/shorten",
+        data=json.dumps({"long_url": url, "domain": domain}).encode("utf-8"),
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=float(os.getenv("SHORTENER_TIMEOUT", "5"))) as resp:
+        return json.load(resp)["link"]
+
+_SHORTENERS: Dict[str, Shortener] = {
+    "local": _shorten_local,
+    "bitly": _shorten_bitly,
+}
+
+def register_shortener(name: str, shortener: Shortener):
+    """
+    Add a shortener backend
+
+    Args:
+        name: Name to select it by (SHORTENER_BACKEND or ShortLinkCache(backend=...))
+        shortener: Callable (long URL, shortener domain) -> short URL
+    """
+    _SHORTENERS[name] = shortener
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS short_links (
+    backend TEXT NOT NULL,
+    domain TEXT NOT NULL,
+    url TEXT NOT NULL,
+    short_url TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (backend, domain, url)
+);
+"""
+
+class ShortLinkCache:
+    def __init__(self, backend: Optional[str] = None, path: Optional[str] = None,
+                 max_memory_entries: Optional[int] = None):
+        """
+        Initialize the short-link cache
+
+        Args:
+            backend: Shortener backend name (defaults to SHORTENER_BACKEND; empty disables shortening)
+            path: SQLite file (defaults to SHORTLINK_CACHE_PATH or ./short_links.sqlite3)
+            max_memory_entries: LRU bound on short links also kept in memory
+        """
+        self.backend = backend if backend is not None else os.getenv("SHORTENER_BACKEND", "")
+        if self.backend and self.backend not in _SHORTENERS:
+            raise ValueError(f"Unknown shortener backend {self.backend!r}; registered: {sorted(_SHORTENERS)}")
+        self.path = path or os.getenv("SHORTLINK_CACHE_PATH", "short_links.sqlite3")
+        self.max_memory_entries = max_memory_entries or int(os.getenv("SHORTLINK_MEMORY_ENTRIES", "10000"))
+        self._memory: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # One URL always maps to the same stripe, so concurrent requests for it shorten it once
+        self._stripes = [threading.Lock() for _ in range(32)]
+        self.hits = 0
+        self.shortened = 0
+        self.failures = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.backend)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Caller holds the lock
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _remember(self, key: Tuple[str, str], short_url: str):
+        # Caller holds the lock
+        self._memory[key] = short_url
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def shorten(self, url: str, domain: str) -> str:
+        """
+        Short link for url, from the cache or shortened once and stored
+
+        A failing backend leaves the long URL in place; it is retried next time.
+        """
+        if not self.enabled or not url:
+            return url
+        key = (domain, url)
+        with self._stripes[hash(key) % len(self._stripes)]:
+            with self._lock:
+                short_url = self._memory.get(key)
+                if short_url is None:
+                    row = self._connect().execute(
+                        "SELECT short_url FROM short_links WHERE backend = ? AND domain = ? AND url = ?",
+                        (self.backend, domain, url)).fetchone()
+                    short_url = row[0] if row else None
+                if short_url is not None:
+                    self.hits += 1
+                    self._remember(key, short_url)
+                    return short_url
+            try:
+                short_url = _SHORTENERS[self.backend](url, domain)
+            except Exception as e:
+                self.failures += 1
+                print(f"⚠️ Shortener {self.backend} failed for {url}: {e}")
+                return url
+            with self._lock:
+                conn = self._connect()
+                with conn:
+                    conn.execute("INSERT OR IGNORE INTO short_links (backend, domain, url, short_url, created_at) "
+                                 "VALUES (?, ?, ?, ?, ?)", (self.backend, domain, url, short_url, time.time()))
+                self.shortened += 1
+                self._remember(key, short_url)
+            return short_url
+
+    def stats(self) -> Dict:
+        host = host_allowed.cache_info()
+        parsed = parse_host.cache_info()
+        with self._lock:
+            return {
+                "backend": self.backend or None,
+                "path": self.path,
+                "memory_entries": len(self._memory),
+                "hits": self.hits,
+                "shortened": self.shortened,
+                "failures": self.failures,
+                "url_cache": {"hits": parsed.hits, "misses": parsed.misses, "entries": parsed.currsize},
+                "host_cache": {"hits": host.hits, "misses": host.misses, "entries": host.currsize},
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Global instance
+short_links = ShortLinkCache()
@@ -0,0 +1,196 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format
+
+Counters and histograms are plain Python objects updated under one short lock
+per metric; gauges that mirror state kept elsewhere (config cache, proof writer,
+circuit breaker) are read through collectors only when /metrics is scraped.
+"""
+import os
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Seconds; fine at the low end because most stages take micro- to milliseconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Time the per-check stages of one validation in every N (1 = every validation)
+CHECK_SAMPLE_EVERY = max(1, int(os.getenv("METRICS_CHECK_SAMPLE_EVERY", "10")))
+
+# Label values beyond this many series per metric are folded into "other", so
+# client-supplied values (brands) cannot grow memory without bound
+MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", "500"))
+
+Sample = Tuple[str, Dict[str, str], float]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 max_series: Optional[int] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series or MAX_SERIES
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labelvalues: Tuple[str, ...]) -> Tuple[str, ...]:
+        # Caller holds the lock
+        if labelvalues in self._series or len(self._series) < self.max_series:
+            return labelvalues
+        return ("other",) * len(self.labelnames)
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labelvalues: str, amount: float = 1.0):
+        with self._lock:
+            key = self._key(labelvalues)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = list(self._series.items())
+        return [(self.name, dict(zip(self.labelnames, k)), v) for k, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, max_series: Optional[int] = None):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(buckets)
+
+    def _get_series(self, labelvalues: Tuple[str, ...]) -> List:
+        # Caller holds the lock
+        series = self._series.get(labelvalues)
+        if series is None:
+            key = self._key(labelvalues)
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        return series
+
+    def observe(self, value: float, *labelvalues: str):
+        with self._lock:
+            series = self._get_series(labelvalues)
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def observe_many(self, observations: Iterable[Tuple[str, float]]):
+        """Record several (label value, seconds) pairs for a single-label histogram under one lock"""
+        buckets = self.buckets
+        with self._lock:
+            for label, value in observations:
+                series = self._get_series((label,))
+                series[0][bisect_left(buckets, value)] += 1
+                series[1] += value
+                series[2] += 1
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        out = []
+        for key, counts, total, count in items:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                out.append((self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative))
+            out.append((self.name + "_sum", labels, total))
+            out.append((self.name + "_count", labels, count))
+        return out
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        # Collectors return (name, kind, help, [(labels, value)]) read at scrape time
+        self._collectors: List[Callable[[], List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                print(f"⚠️ Metrics collector failed: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+# Global registry and the metrics the request path records into
+registry = MetricsRegistry()
+
+http_requests = registry.counter(
+    "validator_http_requests_total", "HTTP requests by route template, method and status",
+    ("endpoint", "method", "status"))
+http_request_seconds = registry.histogram(
+    "validator_http_request_duration_seconds", "HTTP request latency by route template",
+    ("endpoint",))
+validations = registry.counter(
+    "validator_validations_total", "Validated bundles by brand and result", ("brand", "result"))
+validation_seconds = registry.histogram(
+    "validator_validation_duration_seconds", "Single-bundle validate() latency by brand", ("brand",))
+stage_seconds = registry.histogram(
+    "validator_stage_duration_seconds", "Time per validation stage: config_load, sha256, proof_write",
+    ("stage",))
+check_seconds = registry.histogram(
+    "validator_check_duration_seconds",
+    f"Time per validator check (check_*, apply_utm, shorten_links), sampled on 1 in {CHECK_SAMPLE_EVERY} validations",
+    ("check",))
+sheets_call_seconds = registry.histogram(
+    "validator_sheets_call_duration_seconds", "Google Sheets API call latency", ("call",))
+sheets_call_errors = registry.counter(
+    "validator_sheets_call_errors_total", "Failed Google Sheets API calls", ("call",))
+variation_candidates = registry.counter(
+    "validator_variation_candidates_total",
+    "Generated variation candidates checked against brand rules, by result (accepted, rejected)", ("result",))
@@ -0,0 +1,176 @@
+"""
+Opt-in per-request profiling
+
+A request is profiled with cProfile when it carries the X-Profile header set to
+DEBUG_TOKEN, or when it is picked by PROFILE_SAMPLE_RATE. Profiles go to a
+bounded ring of files under PROFILE_DIR and are listed and downloaded through
+the authenticated /debug/profiles endpoints.
+"""
+import io
+import os
+import hmac
+import json
+import time
+import random
+import pstats
+import cProfile
+import threading
+import anyio
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+PROFILE_HEADER = b"x-profile"
+
+class ProfileStore:
+    def __init__(self, root: Optional[str] = None, max_profiles: Optional[int] = None):
+        """
+        Initialize the profile ring
+
+        Args:
+            root: Directory for profiles (defaults to PROFILE_DIR or ./profiles)
+            max_profiles: Profiles kept before the oldest are deleted
+        """
+        self.root = root or os.getenv("PROFILE_DIR", "profiles")
+        self.max_profiles = max_profiles or int(os.getenv("PROFILE_RING_SIZE", "50"))
+        self._lock = threading.Lock()
+
+    def _paths(self, profile_id: str):
+        return os.path.join(self.root, f"{profile_id}.prof"), os.path.join(self.root, f"{profile_id}.json")
+
+    def save(self, profile_id: str, profiler: cProfile.Profile, meta: Dict) -> str:
+        """Write a finished profile and its metadata, then trim the ring"""
+        prof_path, meta_path = self._paths(profile_id)
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            profiler.dump_stats(prof_path)
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"id": profile_id, **meta}, f)
+            ids = sorted(n[:-len(".prof")] for n in os.listdir(self.root) if n.endswith(".prof"))
+            for old in ids[:max(0, len(ids) - self.max_profiles)]:
+                for path in self._paths(old):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+        return prof_path
+
+    def list(self) -> List[Dict]:
+        """Metadata of every stored profile, newest first"""
+        if not os.path.isdir(self.root):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.root), reverse=True):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.root, name), "r", encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """Path of a stored .prof file, or None (ids are checked so they cannot escape the root)"""
+        if not profile_id.replace("-", "").isalnum():
+            return None
+        prof_path = self._paths(profile_id)[0]
+        return prof_path if os.path.exists(prof_path) else None
+
+    def summary(self, profile_id: str, sort: str = "cumulative", limit: int = 40) -> Optional[str]:
+        """pstats text report for a stored profile"""
+        prof_path = self.path(profile_id)
+        if prof_path is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(prof_path, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+class ProfilingMiddleware:
+    """
+    Profile selected requests with cProfile
+
+    Only one request is profiled at a time: cProfile hooks the whole event-loop
+    thread, so coroutines of other requests interleaved with the profiled one
+    show up too, and work offloaded to the thread pool does not. Requests that
+    ask for a profile while another is running are served unprofiled and get
+    X-Profile-Id: busy.
+    """
+    def __init__(self, app, store: Optional[ProfileStore] = None, token: Optional[str] = None,
+                 sample_rate: Optional[float] = None):
+        self.app = app
+        self.store = store or profile_store
+        self.token = token if token is not None else os.getenv("DEBUG_TOKEN")
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+        self._active = False
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token:
+            for name, value in scope.get("headers", []):
+                if name == PROFILE_HEADER and hmac.compare_digest(value, self.token.encode("latin-1")):
+                    return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+        if self._active:
+            await self.app(scope, receive, self._with_header(send, b"busy"))
+            return
+
+        # Sortable by creation time, which is what the ring trims by
+        now_ns = time.time_ns()
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now_ns // 10**9))}-{now_ns % 10**9:09d}"
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        self._active = True
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) already owns the hook
+            self._active = False
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, self._with_header(send_with_status, profile_id.encode()))
+        finally:
+            profiler.disable()
+            self._active = False
+            meta = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status": status,
+                "trigger": trigger,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                "created_at": time.time(),
+            }
+            try:
+                await anyio.to_thread.run_sync(self.store.save, profile_id, profiler, meta)
+            except Exception as e:
+                print(f"⚠️ Could not save profile {profile_id}: {e}")
+
+    @staticmethod
+    def _with_header(send, value: bytes):
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", value)]}
+            await send(message)
+        return wrapped
+
+# Global instance
+profile_store = ProfileStore()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+SQLite index over proof records
+
+The week files under proofs/ stay the source of truth; this index sits next to
+them so "was post X validated, and with which hash?" is a B-tree lookup by
+(brand, post_id) or sha256 instead of a scan of every week file. The proof
+writer adds records as it writes them, and `python proof_index.py --import`
+backfills from existing .hash/.jsonl files.
+"""
+import os
+import sqlite3
+import argparse
+import threading
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from proof_log import ProofLog, proof_log
+
+# Load environment variables
+load_dotenv()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS proofs (
+    id INTEGER PRIMARY KEY,
+    brand TEXT NOT NULL COLLATE NOCASE,
+    week TEXT NOT NULL,
+    post_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    leaf INTEGER,
+    UNIQUE (brand, week, post_id, sha256, timestamp)
+);
+CREATE INDEX IF NOT EXISTS proofs_brand_post ON proofs (brand, post_id);
+CREATE INDEX IF NOT EXISTS proofs_sha256 ON proofs (sha256);
+"""
+
+_COLUMNS = ("brand", "week", "post_id", "sha256", "timestamp", "leaf")
+
+class ProofIndex:
+    def __init__(self, path: Optional[str] = None, log: Optional[ProofLog] = None):
+        """
+        Initialize the proof index
+
+        Args:
+            path: SQLite file (defaults to PROOF_INDEX_PATH or <proof root>/index.sqlite3)
+            log: Proof log whose root holds the default index file
+        """
+        self.path = path or os.getenv("PROOF_INDEX_PATH")
+        self.log = log or proof_log
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Caller holds the lock
+        if self._conn is None:
+            path = self.path or os.path.join(self.log._root(), "index.sqlite3")
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            # Indexes created before records carried their Merkle leaf position
+            if "leaf" not in {row[1] for row in conn.execute("PRAGMA table_info(proofs)")}:
+                conn.execute("ALTER TABLE proofs ADD COLUMN leaf INTEGER")
+            self.path = path
+            self._conn = conn
+        return self._conn
+
+    def add(self, brand: str, week: str, records: List[Dict], first_leaf: Optional[int] = None) -> int:
+        """
+        Index records of one brand/week in a single transaction
+
+        Args:
+            first_leaf: Merkle leaf position of the first record (the rest follow on)
+
+        Returns:
+            Number of records that were not already indexed
+        """
+        rows = [(brand, week, r.get("post_id", ""), r.get("sha256", "").lower(), r.get("timestamp", ""),
+                 None if first_leaf is None else first_leaf + i) for i, r in enumerate(records)]
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    "INSERT OR IGNORE INTO proofs (brand, week, post_id, sha256, timestamp, leaf) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows)
+                added = conn.total_changes - before
+                if first_leaf is not None and added < len(rows):
+                    # Rows indexed before their leaf position was known
+                    conn.executemany(
+                        "UPDATE proofs SET leaf = ? WHERE brand = ? AND week = ? AND post_id = ? AND sha256 = ? "
+                        "AND timestamp = ? AND leaf IS NULL",
+                        [row[-1:] + row[:-1] for row in rows])
+                return added
+
+    def _query(self, where: str, params: tuple) -> List[Dict]:
+        with self._lock:
+            rows = self._connect().execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM proofs WHERE {where} ORDER BY timestamp DESC", params
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def by_post(self, brand: str, post_id: str) -> List[Dict]:
+        """Every proof for a post (brand matched case-insensitively), newest first"""
+        return self._query("brand = ? AND post_id = ?", (brand, post_id))
+
+    def by_hash(self, sha256: str) -> List[Dict]:
+        """Every proof with this bundle hash, newest first"""
+        return self._query("sha256 = ?", (sha256.lower(),))
+
+    def import_files(self, log: Optional[ProofLog] = None) -> Dict[str, int]:
+        """Backfill from every .hash/.jsonl week file under the proof root; safe to rerun"""
+        log = log or self.log
+        root = log._root()
+        weeks = added = 0
+        if os.path.isdir(root):
+            for brand in sorted(os.listdir(root)):
+                for week in log.weeks(brand):
+                    # Leaf positions follow record order, as when a tree is rebuilt from the log
+                    added += self.add(brand, week, log.read(brand, week).get("posts", []), first_leaf=0)
+                    weeks += 1
+        return {"weeks": weeks, "added": added}
+
+    def stats(self) -> Dict:
+        with self._lock:
+            count = self._connect().execute("SELECT COUNT(*) FROM proofs").fetchone()[0]
+        return {"path": self.path, "records": count}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+# Global instance
+proof_index = ProofIndex()
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the SQLite proof index')
+    parser.add_argument('--root', help='Proof directory (default: ./proofs)')
+    parser.add_argument('--db', help='Index file (default: PROOF_INDEX_PATH or <root>/index.sqlite3)')
+    parser.add_argument('--import', dest='do_import', action='store_true', help='Index every existing .hash/.jsonl week file')
+
+    args = parser.parse_args()
+
+    index = ProofIndex(path=args.db, log=ProofLog(root=args.root))
+    if args.do_import:
+        result = index.import_files()
+        print(f"✓ Indexed {result['added']} new records from {result['weeks']} week files into {index.path}")
+    print(f"📊 {index.stats()['records']} records in {index.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Append-only proof log
+
+Each validated post appends one JSON line to proofs/<brand>/<week>.jsonl.
+The legacy proofs/<brand>/<week>.hash JSON ({"brand", "week", "posts"}) is
+still read, and compaction folds the log back into that shape for readers
+that expect it.
+"""
+import os
+import json
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class ProofLog:
+    def __init__(self, root: Optional[str] = None, compact_every: Optional[int] = None):
+        """
+        Initialize the proof log
+
+        Args:
+            root: Proof directory (defaults to ./proofs at call time)
+            compact_every: Compact a week after this many appended records (0 disables)
+        """
+        self.root = root
+        self.compact_every = compact_every if compact_every is not None else int(os.getenv("PROOF_COMPACT_EVERY", "0"))
+        self._lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+
+    def _root(self) -> str:
+        # Use a writable directory instead of /Codex
+        return self.root or os.path.join(os.getcwd(), "proofs")
+
+    def paths(self, brand: str, week: str) -> Tuple[str, str]:
+        """(legacy .hash path, .jsonl log path) for a brand/week"""
+        base = os.path.join(self._root(), brand, week)
+        return f"{base}.hash", f"{base}.jsonl"
+
+    def append(self, brand: str, week: str, records: List[Dict], fsync: bool = False) -> str:
+        """
+        Append records to the week log in a single write
+
+        Returns:
+            Path of the log file
+        """
+        _, log_path = self.paths(brand, week)
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            os.makedirs(os.path.dirname(log_path), exist_ok=True)
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(data)
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            pending = self._pending.get(log_path, 0) + len(records)
+            self._pending[log_path] = pending
+        if self.compact_every and pending >= self.compact_every:
+            self.compact(brand, week)
+        return log_path
+
+    def _read_unlocked(self, brand: str, week: str) -> Dict:
+        hash_path, log_path = self.paths(brand, week)
+        blob = {"brand": brand, "week": week, "posts": []}
+        if os.path.exists(hash_path):
+            try:
+                with open(hash_path, "r", encoding="utf-8") as f:
+                    blob = json.load(f)
+            except Exception as e:
+                print(f"⚠️ Unreadable proof file {hash_path}: {e}")
+        if os.path.exists(log_path):
+            # A crash between compaction's replace and remove can leave records in
+            # both files; they are identical down to the timestamp, so drop repeats
+            seen = {(p.get("post_id"), p.get("sha256"), p.get("timestamp")) for p in blob["posts"]}
+            with open(log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn final line from an interrupted append
+                        continue
+                    key = (record.get("post_id"), record.get("sha256"), record.get("timestamp"))
+                    if key not in seen:
+                        seen.add(key)
+                        blob["posts"].append(record)
+        return blob
+
+    def read(self, brand: str, week: str) -> Dict:
+        """Week proofs in the legacy {"brand", "week", "posts"} shape, from both formats"""
+        with self._lock:
+            return self._read_unlocked(brand, week)
+
+    def compact(self, brand: str, week: str) -> str:
+        """
+        Fold the week log into the .hash JSON and remove the log
+
+        Assumes a single writer process; with several workers, run compaction
+        offline (python proof_log.py --compact).
+        """
+        hash_path, log_path = self.paths(brand, week)
+        with self._lock:
+            blob = self._read_unlocked(brand, week)
+            os.makedirs(os.path.dirname(hash_path), exist_ok=True)
+            tmp_path = f"{hash_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(blob, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, hash_path)
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            self._pending.pop(log_path, None)
+        return hash_path
+
+    def weeks(self, brand: str) -> List[str]:
+        """Weeks with proofs for a brand, in either format"""
+        brand_dir = os.path.join(self._root(), brand)
+        if not os.path.isdir(brand_dir):
+            return []
+        weeks = {os.path.splitext(f)[0] for f in os.listdir(brand_dir) if f.endswith((".hash", ".jsonl"))}
+        return sorted(weeks)
+
+    def compact_all(self) -> List[str]:
+        """Compact every brand/week under the proof root"""
+        compacted = []
+        root = self._root()
+        if not os.path.isdir(root):
+            return compacted
+        for brand in sorted(os.listdir(root)):
+            for week in self.weeks(brand):
+                if os.path.exists(self.paths(brand, week)[1]):
+                    compacted.append(self.compact(brand, week))
+        return compacted
+
+# Global instance
+proof_log = ProofLog()
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain append-only proof logs')
+    parser.add_argument('--root', help='Proof directory (default: ./proofs)')
+    parser.add_argument('--compact', action='store_true', help='Fold every .jsonl log into its .hash file')
+
+    args = parser.parse_args()
+
+    log = ProofLog(root=args.root)
+    if args.compact:
+        for path in log.compact_all():
+            print(f"✓ Compacted {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Per brand/week Merkle trees over proof records
+
+Each week's records are the leaves, in log order, of an RFC 6962 style tree
+(leaf = sha256(0x00 || record), node = sha256(0x01 || left || right)). Leaf
+hashes are appended to proofs/<brand>/<week>.merkle and the current root is
+published in proofs/<brand>/<week>.root. In memory every complete subtree is
+kept, so appending a record costs O(log n) hashes and an inclusion proof
+has O(log n) entries.
+"""
+import os
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from proof_log import ProofLog, proof_log
+
+# Load environment variables
+load_dotenv()
+
+HASH_SIZE = 32
+
+def leaf_hash(record: Dict) -> bytes:
+    """Hash of one proof record as a Merkle leaf"""
+    data = json.dumps(record, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(b"\x00" + data).digest()
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+def verify_inclusion(leaf: bytes, index: int, size: int, path: List[bytes], root: bytes) -> bool:
+    """Check an inclusion proof (RFC 9162, section 2.1.3.2)"""
+    if index >= size:
+        return False
+    fn, sn = index, size - 1
+    r = leaf
+    for p in path:
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = node_hash(p, r)
+            if not fn & 1:
+                while fn & 1 == 0 and fn != 0:
+                    fn >>= 1
+                    sn >>= 1
+        else:
+            r = node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and r == root
+
+class MerkleTree:
+    def __init__(self, leaves: Optional[List[bytes]] = None):
+        # levels[k][i] is the root of the complete subtree over leaves [i*2^k, (i+1)*2^k)
+        self.levels: List[List[bytes]] = [[]]
+        for leaf in leaves or []:
+            self.append(leaf)
+
+    @property
+    def size(self) -> int:
+        return len(self.levels[0])
+
+    def append(self, leaf: bytes) -> int:
+        """Add a leaf, completing at most log2(n) subtrees; returns its index"""
+        index = self.size
+        self.levels[0].append(leaf)
+        level, i = 0, index
+        while i & 1:
+            parent = node_hash(self.levels[level][i - 1], self.levels[level][i])
+            level += 1
+            if level == len(self.levels):
+                self.levels.append([])
+            self.levels[level].append(parent)
+            i >>= 1
+        return index
+
+    def _subtree(self, lo: int, hi: int) -> bytes:
+        """Hash of leaves [lo, hi): complete subtrees come from the levels, the ragged right edge is folded"""
+        n = hi - lo
+        if n & (n - 1) == 0 and lo % n == 0:
+            return self.levels[n.bit_length() - 1][lo // n]
+        k = 1 << ((n - 1).bit_length() - 1)
+        return node_hash(self._subtree(lo, lo + k), self._subtree(lo + k, hi))
+
+    def root(self) -> bytes:
+        if self.size == 0:
+            return hashlib.sha256(b"").digest()
+        return self._subtree(0, self.size)
+
+    def inclusion_proof(self, index: int) -> List[bytes]:
+        """Audit path for a leaf, leaf-side sibling first"""
+        if not 0 <= index < self.size:
+            raise IndexError(f"Leaf {index} not in a tree of {self.size}")
+        path = []
+        lo, hi = 0, self.size
+        while hi - lo > 1:
+            k = 1 << ((hi - lo - 1).bit_length() - 1)
+            if index < lo + k:
+                path.append(self._subtree(lo + k, hi))
+                hi = lo + k
+            else:
+                path.append(self._subtree(lo, lo + k))
+                lo = lo + k
+        return path[::-1]
+
+class MerkleStore:
+    def __init__(self, log: Optional[ProofLog] = None, max_weeks: Optional[int] = None):
+        """
+        Initialize the Merkle store
+
+        Args:
+            log: Proof log whose weeks the trees cover (and are rebuilt from)
+            max_weeks: Week trees kept in memory
+        """
+        self.log = log or proof_log
+        self.max_weeks = max_weeks or int(os.getenv("MERKLE_CACHE_WEEKS", "64"))
+        self._trees: "OrderedDict[Tuple[str, str], MerkleTree]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def paths(self, brand: str, week: str) -> Tuple[str, str]:
+        """(.merkle leaf file, .root file) for a brand/week"""
+        for part in (brand, week):
+            if not part or part.startswith(".") or os.sep in part or (os.altsep and os.altsep in part):
+                raise ValueError(f"Invalid proof path component: {part!r}")
+        base = os.path.join(self.log._root(), brand, week)
+        return f"{base}.merkle", f"{base}.root"
+
+    def tree(self, brand: str, week: str) -> MerkleTree:
+        """
+        Tree for a week, from the leaf file when it covers exactly the week's
+        records, otherwise (weeks written before trees existed, a leaf file out
+        of step with the log) rebuilt from the records
+        """
+        return self._tree(brand, week)
+
+    def _tree(self, brand: str, week: str, pending: int = 0) -> MerkleTree:
+        # pending: records already in the log that the caller is about to append
+        key = (brand, week)
+        with self._lock:
+            tree = self._trees.get(key)
+            if tree is not None:
+                self._trees.move_to_end(key)
+                return tree
+            # paths() rejects unsafe brand/week names before anything is read
+            leaf_path, _ = self.paths(brand, week)
+            posts = self.log.read(brand, week).get("posts", [])
+            if pending:
+                posts = posts[:max(len(posts) - pending, 0)]
+            has_file = os.path.exists(leaf_path)
+            if has_file:
+                with open(leaf_path, "rb") as f:
+                    data = f.read()
+                # A torn final write leaves a partial hash; drop it
+                usable = len(data) - len(data) % HASH_SIZE
+                tree = MerkleTree([data[i:i + HASH_SIZE] for i in range(0, usable, HASH_SIZE)])
+                if tree.size != len(posts):
+                    print(f"⚠️ Merkle leaves for {brand}/{week} cover {tree.size} of {len(posts)} records; rebuilding")
+                    tree = None
+            if tree is None:
+                tree = MerkleTree([leaf_hash(r) for r in posts])
+                if tree.size or has_file:
+                    self._write_leaves(brand, week, tree.levels[0], mode="wb")
+                    self._publish(brand, week, tree)
+            self._trees[key] = tree
+            while len(self._trees) > self.max_weeks:
+                self._trees.popitem(last=False)
+            return tree
+
+    def _write_leaves(self, brand: str, week: str, leaves: List[bytes], mode: str = "ab", fsync: bool = False):
+        leaf_path, _ = self.paths(brand, week)
+        os.makedirs(os.path.dirname(leaf_path), exist_ok=True)
+        with open(leaf_path, mode) as f:
+            f.write(b"".join(leaves))
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _publish(self, brand: str, week: str, tree: MerkleTree):
+        _, root_path = self.paths(brand, week)
+        tmp_path = f"{root_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"brand": brand, "week": week, "size": tree.size, "root": tree.root().hex()}, f)
+        os.replace(tmp_path, root_path)
+
+    def append(self, brand: str, week: str, records: List[Dict], fsync: bool = False) -> int:
+        """
+        Add records that were just appended to the week log
+
+        Call tree() before appending to the log; if the tree has to be loaded
+        here, the last len(records) log records are taken to be these ones.
+
+        Returns:
+            Leaf index of the first record
+        """
+        with self._lock:
+            tree = self._tree(brand, week, pending=len(records))
+            leaves = [leaf_hash(r) for r in records]
+            first = tree.size
+            for leaf in leaves:
+                tree.append(leaf)
+            self._write_leaves(brand, week, leaves, fsync=fsync)
+            self._publish(brand, week, tree)
+            return first
+
+    def invalidate(self, brand: str, week: str):
+        """Forget a week's tree and leaf file so it is rebuilt from the log"""
+        with self._lock:
+            self._trees.pop((brand, week), None)
+            leaf_path, _ = self.paths(brand, week)
+            try:
+                os.remove(leaf_path)
+            except FileNotFoundError:
+                pass
+
+    def root(self, brand: str, week: str) -> Dict:
+        """Published root of a week's tree"""
+        with self._lock:
+            tree = self.tree(brand, week)
+            return {"brand": brand, "week": week, "size": tree.size, "root": tree.root().hex()}
+
+    def prove(self, brand: str, week: str, record: Dict, leaf_index: Optional[int] = None) -> Optional[Dict]:
+        """
+        Inclusion proof of a record against the week's current root
+
+        Args:
+            record: The proof record as written ({post_id, sha256, timestamp})
+            leaf_index: Position from the proof index; checked, and the leaves are
+                scanned when it is missing or does not match
+
+        Returns:
+            Proof dict, or None if the record is not in the week's tree
+        """
+        leaf = leaf_hash(record)
+        with self._lock:
+            tree = self.tree(brand, week)
+            leaves = tree.levels[0]
+            if leaf_index is None or not 0 <= leaf_index < tree.size or leaves[leaf_index] != leaf:
+                try:
+                    leaf_index = leaves.index(leaf)
+                except ValueError:
+                    return None
+            return {
+                "brand": brand,
+                "week": week,
+                "record": record,
+                "leaf_index": leaf_index,
+                "leaf_hash": leaf.hex(),
+                "tree_size": tree.size,
+                "path": [h.hex() for h in tree.inclusion_proof(leaf_index)],
+                "root": tree.root().hex(),
+            }
+
+# Global instance
+merkle_store = MerkleStore()
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or check per-week Merkle trees over proof records')
+    parser.add_argument('--root', help='Proof directory (default: ./proofs)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild every tree from the week records')
+
+    args = parser.parse_args()
+
+    log = ProofLog(root=args.root)
+    store = MerkleStore(log=log)
+    proof_root = log._root()
+    if not os.path.isdir(proof_root):
+        return
+    for brand in sorted(os.listdir(proof_root)):
+        for week in log.weeks(brand):
+            if args.rebuild:
+                store.invalidate(brand, week)
+            info = store.root(brand, week)
+            print(f"✓ {brand}/{week}: {info['size']} records, root {info['root']}")
+
+if __name__ == "__main__":
+    main()
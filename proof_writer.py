@@ -0,0 +1,233 @@
+"""
+Group-commit background writer for proof records
+"""
+import os
+import time
+import queue
+import asyncio
+import anyio
+import atexit
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from proof_log import proof_log, ProofLog
+from proof_index import proof_index, ProofIndex
+from proof_merkle import merkle_store, MerkleStore
+
+# Load environment variables
+load_dotenv()
+
+DURABILITY_MODES = ("sync", "flush", "enqueue")
+
+_STOP = object()
+
+class ProofWriter:
+    def __init__(self, log: Optional[ProofLog] = None, durability: Optional[str] = None,
+                 linger_ms: Optional[float] = None, max_batch: Optional[int] = None,
+                 index: Optional[ProofIndex] = None, merkle: Optional[MerkleStore] = None):
+        """
+        Initialize the proof writer
+
+        Args:
+            log: Proof log to append to
+            index: Lookup index updated after each successful append
+            merkle: Per-week Merkle trees extended with each append
+            durability: "flush" acks after the batch is written and fsynced,
+                "enqueue" acks as soon as the record is queued, "sync" writes
+                inline on the calling thread
+            linger_ms: How long the writer waits to gather more records into a batch
+            max_batch: Maximum records per group commit
+        """
+        self.log = log or proof_log
+        self.index = index or (proof_index if log is None else ProofIndex(log=self.log))
+        self.merkle = merkle or (merkle_store if log is None else MerkleStore(log=self.log))
+        self.durability = (durability or os.getenv("PROOF_DURABILITY", "flush")).lower()
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f"PROOF_DURABILITY must be one of {DURABILITY_MODES}, got {self.durability!r}")
+        self.linger = (linger_ms if linger_ms is not None else float(os.getenv("PROOF_FLUSH_LINGER_MS", "5"))) / 1000
+        self.max_batch = max_batch or int(os.getenv("PROOF_FLUSH_MAX_BATCH", "500"))
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._atexit_registered = False
+        # Keeps the Merkle leaves in the same order as the log lines
+        self._append_lock = threading.Lock()
+        self.enqueued = 0
+        self.flushed_batches = 0
+        self.flushed_records = 0
+        self.failures = 0
+        self.index_failures = 0
+        self.merkle_failures = 0
+
+    def _merkle_failed(self, brand: str, week: str, error: Exception):
+        # Dropping the leaf file makes the next use rebuild the tree from the log
+        self.merkle_failures += 1
+        print(f"⚠️ Merkle tree update failed for {brand}/{week}: {error}")
+        self.merkle.invalidate(brand, week)
+
+    def _append(self, brand: str, week: str, records: List[Dict], fsync: bool = False) -> str:
+        first_leaf = None
+        with self._append_lock:
+            # Load (or rebuild) the week's tree before the new records reach the log
+            try:
+                self.merkle.tree(brand, week)
+                tree_loaded = True
+            except Exception as e:
+                tree_loaded = False
+                self._merkle_failed(brand, week, e)
+            path = self.log.append(brand, week, records, fsync=fsync)
+            if tree_loaded:
+                try:
+                    first_leaf = self.merkle.append(brand, week, records, fsync=fsync)
+                except Exception as e:
+                    self._merkle_failed(brand, week, e)
+        try:
+            self.index.add(brand, week, records, first_leaf=first_leaf)
+        except Exception as e:
+            # The week files stay authoritative; `proof_index.py --import` repairs the index
+            self.index_failures += 1
+            print(f"⚠️ Proof index update failed for {brand}/{week}: {e}")
+        return path
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="proof-writer", daemon=True)
+                self._thread.start()
+                # shutdown() lets a later write start a new thread; one exit handler covers them all
+                if not self._atexit_registered:
+                    atexit.register(self.shutdown)
+                    self._atexit_registered = True
+
+    def submit(self, brand: str, week: str, records: List[Dict]) -> Future:
+        """Queue records for the next group commit; the future resolves to the log path"""
+        fut: Future = Future()
+        self._ensure_started()
+        self._queue.put((brand, week, records, fut))
+        self.enqueued += len(records)
+        return fut
+
+    def write(self, brand: str, week: str, records: List[Dict]) -> str:
+        """
+        Write records according to the durability mode
+
+        Returns:
+            Path of the week log the records go to
+        """
+        if self.durability == "sync":
+            return self._append(brand, week, records)
+        fut = self.submit(brand, week, records)
+        if self.durability == "flush":
+            return fut.result()
+        return self.log.paths(brand, week)[1]
+
+    async def write_async(self, brand: str, week: str, records: List[Dict]) -> str:
+        """write() for event-loop callers: awaits the flush instead of blocking a thread"""
+        if self.durability == "sync":
+            return await anyio.to_thread.run_sync(self._append, brand, week, records)
+        fut = self.submit(brand, week, records)
+        if self.durability == "flush":
+            return await asyncio.wrap_future(fut)
+        return self.log.paths(brand, week)[1]
+
+    def _drain(self, first) -> Tuple[List, bool]:
+        batch = [first]
+        stop = False
+        count = len(first[2])
+        deadline = time.monotonic() + self.linger
+        while count < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+            count += len(item[2])
+        return batch, stop
+
+    def _commit(self, batch: List):
+        groups: Dict[Tuple[str, str], List] = {}
+        for brand, week, records, fut in batch:
+            groups.setdefault((brand, week), []).append((records, fut))
+        for (brand, week), items in groups.items():
+            records = [r for recs, _ in items for r in recs]
+            # Records of a cancelled wait are still written; only the futures
+            # still pending are resolved (a cancelled one raises on set_result)
+            items = [(recs, fut if fut.set_running_or_notify_cancel() else None) for recs, fut in items]
+            try:
+                path = self._append(brand, week, records, fsync=True)
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Proof write failed for {brand}/{week}: {e}")
+                for _, fut in items:
+                    if fut is not None:
+                        fut.set_exception(e)
+                continue
+            self.flushed_batches += 1
+            self.flushed_records += len(records)
+            for _, fut in items:
+                if fut is not None:
+                    fut.set_result(path)
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._drain(first)
+            try:
+                self._commit(batch)
+            except Exception as e:
+                # One bad batch must not end the thread, or every later flush write hangs
+                self.failures += 1
+                print(f"❌ Proof writer batch failed: {e}")
+            if stop:
+                break
+        # Anything queued after the stop marker still gets written
+        leftover = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            try:
+                self._commit(leftover)
+            except Exception as e:
+                self.failures += 1
+                print(f"❌ Proof writer batch failed: {e}")
+
+    def shutdown(self, timeout: Optional[float] = 10.0):
+        """Flush everything queued and stop the writer thread"""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+        with self._start_lock:
+            if self._thread is thread:
+                self._thread = None
+
+    def stats(self) -> Dict:
+        """Queue depth and flush counters"""
+        return {
+            "durability": self.durability,
+            "queue_depth": self._queue.qsize(),
+            "enqueued": self.enqueued,
+            "flushed_batches": self.flushed_batches,
+            "flushed_records": self.flushed_records,
+            "failures": self.failures,
+            "index_failures": self.index_failures,
+            "merkle_failures": self.merkle_failures,
+        }
+
+# Global instance
+proof_writer = ProofWriter()
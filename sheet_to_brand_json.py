@@ -11,13 +11,15 @@ import os
 import argparse
 from typing import Dict, List, Any, Optional
 import warnings
+from config_snapshot import write_snapshot
 
 warnings.filterwarnings('ignore')
 
 class BrandConfigConverter:
-    def __init__(self, excel_file: str, output_dir: str = "config"):
+    def __init__(self, excel_file: str, output_dir: str = "config", snapshot: bool = True):
         self.excel_file = excel_file
         self.output_dir = output_dir
+        self.snapshot = snapshot
         self.brands = []
         self.platforms = []
         
@@ -470,6 +472,11 @@ class BrandConfigConverter:
             
         print(f"✓ Saved multi-brand config to {multibrand_file}")
         
+    def create_binary_snapshot(self, all_configs: Dict[str, Dict[str, Any]]):
+        """Write the versioned binary snapshot the server loads at startup"""
+        snapshot_file = write_snapshot(all_configs, self.output_dir)
+        print(f"✓ Saved binary config snapshot to {snapshot_file}")
+        
     def convert(self):
         """Main conversion process"""
         print("Starting Excel to Brand JSON conversion...")
@@ -493,6 +500,8 @@ class BrandConfigConverter:
         # Create multi-brand config
         if all_configs:
             self.create_multibrand_config(all_configs)
+            if self.snapshot:
+                self.create_binary_snapshot(all_configs)
             
         print(f"\n✓ Conversion complete! Created {len(all_configs)} brand configs in {self.output_dir}/")
         print(f"Brands processed: {list(all_configs.keys())}")
@@ -501,6 +510,7 @@ def main():
     parser = argparse.ArgumentParser(description='Convert Excel/Google Sheets to Brand JSON configs')
     parser.add_argument('--sheet', help='Path to Excel file (auto-detected if not provided)')
     parser.add_argument('--out', default='config', help='Output directory (default: config)')
+    parser.add_argument('--no-snapshot', action='store_true', help='Skip the binary config snapshot')
     
     args = parser.parse_args()
     
@@ -526,7 +536,7 @@ def main():
             print(f"Error: Excel file not found: {args.sheet}")
             return
         
-    converter = BrandConfigConverter(args.sheet, args.out)
+    converter = BrandConfigConverter(args.sheet, args.out, snapshot=not args.no_snapshot)
     converter.convert()
 
 if __name__ == "__main__":
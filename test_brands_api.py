@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+In-process tests for GET /brands content negotiation
+Runs against the brand configs in ./config through FastAPI's TestClient
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+from app import _accepts_gzip
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, "API_TOKEN", None)
+    return TestClient(app_module.app)
+
+def test_accepts_gzip():
+    """gzip is used only when Accept-Encoding gives it (or *) a q-value above zero"""
+    accepted = ["gzip", "GZIP", "deflate, gzip", "gzip;q=0.5", "gzip; q=1.0, br", "*", "br, *;q=0.1",
+                "x-gzip", "gzip;q=0, x-gzip"]
+    refused = [None, "", "identity", "br, deflate", "gzip;q=0", "gzip; q=0.0, br", "*;q=0", "*, gzip;q=0",
+               "gzip;q=oops", "gzipx"]
+    for header in accepted:
+        assert _accepts_gzip(header), header
+    for header in refused:
+        assert not _accepts_gzip(header), header
+
+def test_brands_gzip_negotiation(client):
+    """A client that refused gzip gets the plain body"""
+    plain = client.get("/brands", headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+    assert "content-encoding" not in plain.headers
+
+    refused = client.get("/brands", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in refused.headers
+    assert refused.content == plain.content
+
+    gzipped = client.get("/brands", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.json() == plain.json()
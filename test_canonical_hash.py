@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compatibility test for canonical bundle hashing
+Every registered encoder backend must give the same sha256 as the original
+sha256_of_bundle (json.dumps(sort_keys=True, ensure_ascii=False) in UTF-8),
+because proofs already written store those digests
+"""
+
+import hashlib
+import json
+import random
+
+import canonical_hash
+from canonical_hash import CanonicalHasher
+from bench_suite import synthetic_brand, synthetic_posts
+from validator import sha256_of_bundle
+
+# Digests written by the original implementation
+KNOWN_DIGESTS = [
+    ({"brand": "Amar", "platform": "instagram", "post_id": "amar-2025-w01-ig-1",
+      "caption": "Refurbished phones with quality guaranteed. Trade in today.",
+      "hashtags": ["#Amar", "#Refurbished"],
+      "links": [{"url": "https://amar.co.uk/shop?utm_source=instagram&utm_medium=social&utm_campaign=amar"}],
+      "media_suggestion": {"type": "image"}},
+     "9640d3710cb1b490577e7d419959d9a4efc28ea8dcb0ccc1d0a58fbfd9b0b279"),
+    ({"brand": "Hurry Before It’s Gone", "platform": "tiktok", "post_id": "hbig-ü-1",
+      "caption": "Ends tonight — 50% off 🎉\n\"quoted\"\ttab \\ backslash  ",
+      "hashtags": [], "links": [],
+      "media_suggestion": {"type": "video", "duration": 15.5, "loop": True, "thumb": None}},
+     "6e0e91ae8181e07bfbb023cd63d53043c2621727c30ded2cddb7fb130cd446f5"),
+]
+
+def legacy_sha256(bundle) -> str:
+    """sha256_of_bundle as it was before the canonical hasher"""
+    return hashlib.sha256(json.dumps(bundle, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def edge_cases():
+    yield {}
+    yield {"b": 1, "a": [1, 2.0, -0.0, 1e300, 3.14159, 10**30], "c": {"z": None, "y": False}}
+    yield {"caption": "\x00\x1f\x7f   ퟿ \U0001f600 é ß 中文", "k\"ey": "v\\al"}
+    yield {"nested": [[[{"deep": [{"x": "y" * 1000}]}]]]}
+    yield {str(i): {"v": i, "s": "ü" * (i % 7)} for i in range(5000)}
+
+def bundles():
+    cfg = synthetic_brand("Amar")
+    yield from synthetic_posts(cfg, 200, 0.3, seed=7)
+    yield from edge_cases()
+    rng = random.Random(3)
+    for _ in range(200):
+        yield {"".join(rng.choice("abcAB_é🎉") for _ in range(rng.randint(1, 6))): rng.choice(
+            [rng.random(), rng.randint(-10**6, 10**6), "".join(rng.choice(" \"\\\né€😀a") for _ in range(8)), None, True])
+            for _ in range(rng.randint(0, 12))}
+
+def test_known_digests():
+    """Digests recorded by the original implementation are reproduced"""
+    for bundle, digest in KNOWN_DIGESTS:
+        assert legacy_sha256(bundle) == digest
+        assert sha256_of_bundle(bundle) == digest
+
+def test_backends_match_legacy():
+    """Every backend hashes every bundle exactly like the original implementation"""
+    hashers = [CanonicalHasher(backend=name) for name in canonical_hash.backends()]
+    for bundle in bundles():
+        expected = legacy_sha256(bundle)
+        for hasher in hashers:
+            assert hasher.hexdigest(bundle) == expected, f"backend {hasher.backend} differs"
+
+def main():
+    """Check every backend and print what was compared"""
+    count = 0
+    for bundle in bundles():
+        expected = legacy_sha256(bundle)
+        for name in canonical_hash.backends():
+            if CanonicalHasher(backend=name).hexdigest(bundle) != expected:
+                print(f"❌ Backend {name} differs on {json.dumps(bundle, ensure_ascii=False)[:80]}")
+                return
+        count += 1
+    print(f"✅ {len(canonical_hash.backends())} backends match the original digests on {count} bundles")
+
+if __name__ == "__main__":
+    main()
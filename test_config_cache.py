@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for the in-process brand config cache
+Time is driven through a fake monotonic clock, so TTLs and stat intervals are
+exact and the tests never sleep
+"""
+
+import os
+import types
+
+import pytest
+
+import config_cache as config_cache_module
+import validator
+from circuit_breaker import CircuitBreaker
+from config_cache import ConfigCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(config_cache_module, "time", types.SimpleNamespace(monotonic=fake))
+    return fake
+
+def write_config(path, brand: str, version: int, mtime: float):
+    path.write_text(f'{{"brand": "{brand}", "v": {version}}}', encoding="utf-8")
+    os.utime(path, (mtime, mtime))
+
+def test_local_entry_follows_file_mtime(tmp_path, clock):
+    """A local entry stays until its file changes, and the file is stat'ed at most once per interval"""
+    cache = ConfigCache(stat_interval=2)
+    path = tmp_path / "amar.json"
+    write_config(path, "Amar", 1, 1_000_000)
+    entry = cache.put("Amar", {"brand": "Amar", "v": 1}, "local", path=str(path))
+    assert cache.get_entry("Amar") is entry
+
+    write_config(path, "Amar", 2, 1_000_100)
+    clock.now += 1
+    assert cache.get_entry("Amar") is entry, "stat'ed again within the interval"
+    clock.now += 1.5
+    assert cache.get_entry("Amar") is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_local_entry_without_file_never_expires(clock):
+    """Configs put without a path (snapshots, fixtures) stay until evicted or invalidated"""
+    cache = ConfigCache(sheets_ttl=10, stat_interval=0)
+    entry = cache.put("Amar", {"brand": "Amar"}, "local")
+    clock.now += 10_000
+    assert cache.get_entry("Amar") is entry
+    cache.invalidate("amar")
+    assert cache.get_entry("Amar") is None
+
+def test_sheets_entry_expires_after_ttl(clock):
+    """A Sheets entry is served for sheets_ttl seconds"""
+    cache = ConfigCache(sheets_ttl=300)
+    entry = cache.put("Amar", {"brand": "Amar"}, "sheets")
+    clock.now += 299.9
+    assert cache.get_entry("Amar") is entry
+    clock.now += 0.1
+    assert cache.get_entry("Amar") is None
+
+def test_fallback_entry_expires_after_ttl(tmp_path, clock):
+    """A local config cached because Sheets failed expires like a Sheets entry, file unchanged"""
+    cache = ConfigCache(sheets_ttl=300, stat_interval=0)
+    path = tmp_path / "amar.json"
+    write_config(path, "Amar", 1, 1_000_000)
+    fallback = cache.put("Amar", {"brand": "Amar"}, "local", path=str(path), fallback=True)
+    plain = cache.put("Hurry", {"brand": "Hurry"}, "local", path=str(path))
+    clock.now += 299
+    assert cache.get_entry("Amar") is fallback
+    clock.now += 1
+    assert cache.get_entry("Amar") is None
+    assert cache.get_entry("Hurry") is plain
+
+def test_fallback_entry_still_follows_mtime(tmp_path, clock):
+    """A fallback entry is also dropped when its file changes before the TTL"""
+    cache = ConfigCache(sheets_ttl=300, stat_interval=0)
+    path = tmp_path / "amar.json"
+    write_config(path, "Amar", 1, 1_000_000)
+    cache.put("Amar", {"brand": "Amar"}, "local", path=str(path), fallback=True)
+    write_config(path, "Amar", 2, 1_000_100)
+    clock.now += 1
+    assert cache.get_entry("Amar") is None
+
+def test_lru_eviction(clock):
+    """Past max_entries the least recently used brand is evicted"""
+    cache = ConfigCache(max_entries=2)
+    cache.put("A", {"brand": "A"}, "local")
+    cache.put("B", {"brand": "B"}, "local")
+    assert cache.get_entry("A") is not None
+    cache.put("C", {"brand": "C"}, "local")
+    assert cache.get_entry("B") is None
+    assert cache.get_entry("A") is not None
+    assert cache.get_entry("C") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["entries"] == 2
+
+def test_brand_keys_ignore_case_and_spaces(clock):
+    """Brands are keyed without case or spaces, as the config file names are"""
+    cache = ConfigCache()
+    entry = cache.put("Hurry Before", {"brand": "Hurry Before"}, "local")
+    assert cache.get_entry("hurrybefore") is entry
+
+def test_sheets_failure_caches_expiring_fallback(clock, monkeypatch):
+    """When Sheets is configured but fails, the local config is cached as a fallback and Sheets is retried after the TTL"""
+    cache = ConfigCache(sheets_ttl=300, stat_interval=0)
+    calls = []
+
+    def failing_sheets(brand):
+        calls.append(brand)
+        raise RuntimeError("Sheets is down")
+
+    monkeypatch.setattr(validator, "config_cache", cache)
+    monkeypatch.setattr(validator, "sheets_breaker", CircuitBreaker("test", failure_threshold=100))
+    monkeypatch.setattr(validator.sheets_service, "is_available", lambda: True)
+    monkeypatch.setattr(validator.sheets_service, "get_brand_config", failing_sheets)
+    monkeypatch.setattr(validator.local_snapshot, "get", lambda brand: None)
+
+    entry = validator._load_brand_entry("Amar")
+    assert entry.source == "local" and entry.fallback
+    assert validator._load_brand_entry("Amar") is entry
+    assert calls == ["Amar"]
+    clock.now += 300
+    assert validator._load_brand_entry("Amar") is not entry
+    assert calls == ["Amar", "Amar"]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the content variation generator
+Brands are synthetic configs registered in the config cache, so no Sheets
+access or local config file is needed
+"""
+
+from fastapi.testclient import TestClient
+
+import app as app_module
+from bench_suite import synthetic_brand
+from config_cache import config_cache
+from content_generator import ContentVariationGenerator
+
+BASE_CONTENT = {
+    "caption": "Refurbished phones with quality guaranteed. Trade in today.",
+    "media_suggestion": {"type": "image"},
+}
+
+def register_brand(name: str, **overrides) -> str:
+    cfg = synthetic_brand(name)
+    cfg.update(overrides)
+    config_cache.put(name, cfg, source="local")
+    return name
+
+# Variations for seed 7 as first generated; a change here changes every seeded result
+GOLDEN_SEED_7 = [
+    ("professional", "Our team is excited to share Refurbished phones with quality guaranteed. Furthermore "
+                     "Quality guaranteed. Thank you for your continued support.",
+     ["#InstagramTag3", "#InstagramTag4", "#InstagramTag34", "#InstagramTag6", "#InstagramTag23"], "Get started"),
+    ("casual", "Hey there! Refurbished phones with quality guaranteed! And Quality guaranteed. "
+               "Let us know what you think!",
+     ["#InstagramTag2", "#InstagramTag5", "#InstagramTag27", "#InstagramTag26", "#InstagramTag4"], "Check it out"),
+    ("friendly", "We're so excited to share Refurbished phones with quality guaranteed! Plus Quality guaranteed. "
+                 "Let's connect!",
+     ["#InstagramTag3", "#InstagramTag36", "#InstagramTag7", "#InstagramTag14", "#InstagramTag37"], "Let's connect"),
+]
+
+def summary(variations):
+    return [(v["tone"], v["caption"], v["hashtags"], v["cta"]) for v in variations]
+
+def test_seed_golden():
+    """A seed gives the same variations as when it was first recorded"""
+    brand = register_brand("Seedbrand")
+    variations = ContentVariationGenerator().generate_variations(BASE_CONTENT, brand, "Instagram", count=3, seed=7)
+    assert [tuple(v) for v in summary(variations)] == GOLDEN_SEED_7
+
+def test_same_seed_same_variations():
+    """Separate generators (so no shared cache) give identical variations for the same seed"""
+    brand = register_brand("Seedbrand")
+    for generate in ("generate_variations", "generate_compliant_variations"):
+        first = getattr(ContentVariationGenerator(), generate)(BASE_CONTENT, brand, "Instagram", count=4, seed=123)
+        second = getattr(ContentVariationGenerator(), generate)(BASE_CONTENT, brand, "Instagram", count=4, seed=123)
+        assert first == second, generate
+
+def test_different_seed_different_variations():
+    """Different seeds draw different wording and tags"""
+    brand = register_brand("Seedbrand")
+    generator = ContentVariationGenerator()
+    outputs = {str(summary(generator.generate_variations(BASE_CONTENT, brand, "Instagram", count=3, seed=seed)))
+               for seed in range(5)}
+    assert len(outputs) == 5
+
+def test_seed_is_cached():
+    """A repeated seeded request is served from the cache"""
+    brand = register_brand("Seedbrand")
+    generator = ContentVariationGenerator()
+    first = generator.generate_variations(BASE_CONTENT, brand, "Instagram", count=3, seed=9)
+    assert generator.generate_variations(BASE_CONTENT, brand, "Instagram", count=3, seed=9) is first
+    assert generator.cache_stats()["hits"] == 1
+
+def test_returned_seed_reproduces_output(monkeypatch):
+    """The seed returned by /generate/variations reproduces its variations, on a fresh generator too"""
+    brand = register_brand("Seedbrand")
+    monkeypatch.setattr(app_module, "API_TOKEN", None)
+    client = TestClient(app_module.app)
+    for compliant in (True, False):
+        request = {"base_content": BASE_CONTENT, "brand": brand, "platform": "Instagram", "count": 3,
+                   "compliant": compliant}
+        first = client.post("/generate/variations", json=request).json()
+        assert first["success"] is True and isinstance(first["seed"], int)
+        monkeypatch.setattr(app_module, "content_generator", ContentVariationGenerator())
+        again = client.post("/generate/variations", json={**request, "seed": first["seed"]}).json()
+        assert again["seed"] == first["seed"]
+        assert again["variations"] == first["variations"]
+
+def test_resample_moves_to_next_tone():
+    """At count=3 a variation whose tone keeps failing is resampled with another tone"""
+    # Every professional starter uses one of these words
+    brand = register_brand("Tonebrand", forbidden_words=["pleased", "excited", "proud"])
+    result = ContentVariationGenerator().generate_compliant_variations(BASE_CONTENT, brand, "Instagram",
+                                                                        count=3, seed=1)
+    assert [r["valid"] for r in result["results"]] == [True, True, True]
+    first = result["results"][0]
+    assert [r["tone"] for r in first["rejected"]] == ["professional"]
+    assert first["attempts"] == 2
+    for r in result["results"]:
+        tones = [rejected["tone"] for rejected in r["rejected"]]
+        assert len(tones) == len(set(tones)), "a resample reused the rejected tone"
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compatibility test for the forbidden-word matcher
+matched_words must report exactly what the original substring scan
+([w for w in words if w.lower() in text.lower()]) did, and with word_boundary
+only words that appear somewhere not embedded in a longer word
+"""
+
+import random
+import re
+
+from forbidden_matcher import ForbiddenWordMatcher, get_matcher
+
+def naive_matches(text, words):
+    """check_forbidden_words as it was before the matcher"""
+    low = text.lower()
+    return [w for w in words if w.lower() in low]
+
+def naive_boundary_matches(text, words):
+    """Words found at least once with no word character joined on either side"""
+    low = text.lower()
+    found = []
+    for w in words:
+        p = w.lower()
+        pattern = ((r"(?<!\w)" if re.match(r"\w", p[0]) else "") + re.escape(p)
+                   + (r"(?!\w)" if re.match(r"\w", p[-1]) else ""))
+        if re.search(pattern, low):
+            found.append(w)
+    return found
+
+CASES = [
+    # Overlapping and nested patterns
+    ("the cheapest cheap deal", ["cheap", "cheapest", "apes", "he", "e"]),
+    ("aaaa", ["a", "aa", "aaa", "aaaaa"]),
+    ("she sells sea shells", ["he", "she", "his", "hers", "shell", "sells"]),
+    ("abcd", ["abc", "bcd", "bc", "abcd", "cde"]),
+    # Duplicates and case
+    ("FREE money, Free!", ["free", "FREE", "free", "Money", "cash"]),
+    # Phrases and punctuation
+    ("Buy now!! Limited-time offer.", ["buy now", "limited-time", "time offer", "now!!", "offer."]),
+    ("", ["anything"]),
+    ("café crème brûlée", ["CAFÉ", "crème brûlée", "rème", "ée"]),
+    ("guaranteed_results and #guaranteed", ["guaranteed", "_results", "#guaranteed"]),
+]
+
+def test_matches_substring_scan():
+    """Hand-picked overlapping, duplicate and mixed-case words match the substring scan"""
+    for text, words in CASES:
+        assert get_matcher(words).matched_words(text) == naive_matches(text, words), (text, words)
+
+def test_matches_substring_scan_random():
+    """Random texts over a small alphabet (so patterns overlap a lot) match the substring scan"""
+    rng = random.Random(11)
+    alphabet = "abAB _-é"
+    for _ in range(500):
+        words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 8))]
+        words += rng.sample(words, k=min(2, len(words)))
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        matcher = ForbiddenWordMatcher(words)
+        assert matcher.matched_words(text) == naive_matches(text, words), (text, words)
+        assert matcher.matched_words(text, word_boundary=True) == naive_boundary_matches(text, words), (text, words)
+
+def test_word_boundary():
+    """With word_boundary a word embedded in a longer word does not count"""
+    words = ["cheap", "free", "win", "free gift", "-time"]
+    matcher = get_matcher(words)
+    assert matcher.matched_words("cheapest freebies, winner") == ["cheap", "free", "win"]
+    assert matcher.matched_words("cheapest freebies, winner", word_boundary=True) == []
+    assert matcher.matched_words("Cheap! free gift, to win.", word_boundary=True) == ["cheap", "free", "win", "free gift"]
+    assert matcher.matched_words("limited-time", word_boundary=True) == ["-time"]
+    # A later whole-word occurrence counts even after an embedded one
+    assert matcher.matched_words("cheapest and cheap", word_boundary=True) == ["cheap"]
+    for text, case_words in CASES:
+        assert (get_matcher(case_words).matched_words(text, word_boundary=True)
+                == naive_boundary_matches(text, case_words)), (text, case_words)
+
+def test_empty_words_ignored():
+    """Empty entries are ignored (the substring scan flagged every caption for them)"""
+    assert get_matcher(["", "free"]).matched_words("free stuff") == ["free"]
+    assert get_matcher([""]).matched_words("anything") == []
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for app.py
+Runs `python -X importtime -c "import app"` in a fresh interpreter and fails if
+cold import gets slower than APP_IMPORT_BUDGET_MS or pulls in modules that
+should only load on first use (pandas, the Google API client)
+"""
+
+import os
+import subprocess
+import sys
+from typing import Dict, Tuple
+
+IMPORT_BUDGET_MS = float(os.getenv("APP_IMPORT_BUDGET_MS", "2000"))
+LAZY_MODULES = ["pandas", "googleapiclient", "google.oauth2"]
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+def measure_import(module: str = "app") -> Tuple[float, Dict[str, float]]:
+    """
+    Import module in a fresh interpreter with -X importtime
+
+    Returns:
+        (cumulative ms for module, cumulative ms per imported module)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        try:
+            cumulative[name.strip()] = int(cum) / 1000
+        except ValueError:
+            continue  # header row
+    return cumulative[module], cumulative
+
+def test_heavy_modules_stay_lazy():
+    """pandas and the Google API client load on first Sheets use, not on import"""
+    _, modules = measure_import()
+    loaded = [m for m in LAZY_MODULES if m in modules]
+    assert not loaded, f"import app loaded {loaded}; import them where they are used"
+
+def test_import_time_budget():
+    """Cold import of app stays under APP_IMPORT_BUDGET_MS"""
+    # Best of three: the first run also pays for filling the OS page cache
+    total = min(measure_import()[0] for _ in range(3))
+    print(f"import app: {total:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    assert total <= IMPORT_BUDGET_MS, f"import app took {total:.0f} ms, budget is {IMPORT_BUDGET_MS:.0f} ms"
+
+def main():
+    """Print the slowest imports and check the budget"""
+    total, modules = measure_import()
+    print(f"🚀 import app: {total:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+    print("\nSlowest imports (cumulative):")
+    for name, ms in sorted(modules.items(), key=lambda kv: kv[1], reverse=True)[:15]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    loaded = [m for m in LAZY_MODULES if m in modules]
+    if loaded:
+        print(f"\n❌ Loaded at import time: {', '.join(loaded)}")
+    if total > IMPORT_BUDGET_MS:
+        print(f"❌ Over budget by {total - IMPORT_BUDGET_MS:.0f} ms")
+    if not loaded and total <= IMPORT_BUDGET_MS:
+        print("\n✅ Import time within budget")
+
+if __name__ == "__main__":
+    main()
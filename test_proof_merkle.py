@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-week Merkle trees over proof records
+Every leaf must verify against the published root, and a tree rebuilt from
+the week log must have the same root as the one built by appending
+"""
+
+import os
+
+import pytest
+
+from proof_log import ProofLog
+from proof_merkle import MerkleStore, MerkleTree, leaf_hash, verify_inclusion
+
+def records(start: int, count: int):
+    return [{"post_id": f"post-{i}", "sha256": f"{i:064x}", "timestamp": "2025-01-06T00:00:00+00:00"}
+            for i in range(start, start + count)]
+
+def write_week(store: MerkleStore, brand: str, week: str, batches):
+    """Append batches the way the proof writer does: tree first, then log, then leaves"""
+    for batch in batches:
+        store.tree(brand, week)
+        store.log.append(brand, week, batch)
+        store.append(brand, week, batch)
+
+def test_inclusion_proofs_verify():
+    """Every leaf of trees of many sizes verifies against the root"""
+    for size in list(range(1, 18)) + [31, 32, 33, 100]:
+        tree = MerkleTree([leaf_hash(r) for r in records(0, size)])
+        root = tree.root()
+        for i in range(size):
+            assert verify_inclusion(tree.levels[0][i], i, size, tree.inclusion_proof(i), root)
+        if size > 1:
+            assert not verify_inclusion(tree.levels[0][0], 1, size, tree.inclusion_proof(1), root)
+
+def test_rebuild_gives_same_root(tmp_path):
+    """Trees built by appending batches match a rebuild from the log, and every record proves"""
+    store = MerkleStore(log=ProofLog(root=str(tmp_path)))
+    batches = [records(0, 1), records(1, 4), records(5, 2), records(7, 13)]
+    write_week(store, "Amar", "W02", batches)
+    appended = store.root("Amar", "W02")
+    assert appended["size"] == 20
+
+    for r in (r for batch in batches for r in batch):
+        proof = store.prove("Amar", "W02", r)
+        assert verify_inclusion(bytes.fromhex(proof["leaf_hash"]), proof["leaf_index"], proof["tree_size"],
+                                [bytes.fromhex(h) for h in proof["path"]], bytes.fromhex(proof["root"]))
+
+    store.invalidate("Amar", "W02")
+    assert store.root("Amar", "W02") == appended
+    assert MerkleStore(log=store.log).root("Amar", "W02") == appended
+
+def test_leaf_file_out_of_step_is_rebuilt(tmp_path):
+    """A leaf file that does not cover the week's records is replaced by a rebuild from the log"""
+    store = MerkleStore(log=ProofLog(root=str(tmp_path)))
+    write_week(store, "Amar", "W02", [records(0, 6)])
+    expected = store.root("Amar", "W02")
+    leaf_path, _ = store.paths("Amar", "W02")
+
+    # Records that reached the log without their leaves
+    store.log.append("Amar", "W02", records(6, 3))
+    fresh = MerkleStore(log=store.log)
+    rebuilt = fresh.root("Amar", "W02")
+    assert rebuilt["size"] == 9
+    assert rebuilt == MerkleStore(log=store.log).root("Amar", "W02")
+    assert os.path.getsize(leaf_path) == 9 * 32
+
+    # Leaves beyond the log
+    with open(leaf_path, "ab") as f:
+        f.write(b"\x00" * 64)
+    assert MerkleStore(log=store.log).root("Amar", "W02") == rebuilt
+    assert expected["root"] != rebuilt["root"]
+
+def test_append_after_eviction(tmp_path):
+    """Appending to a week whose tree was not loaded first does not count the new records twice"""
+    store = MerkleStore(log=ProofLog(root=str(tmp_path)))
+    write_week(store, "Amar", "W02", [records(0, 3)])
+    cold = MerkleStore(log=store.log)
+    store.log.append("Amar", "W02", records(3, 2))
+    assert cold.append("Amar", "W02", records(3, 2)) == 3
+    assert cold.root("Amar", "W02") == MerkleStore(log=store.log).root("Amar", "W02")
+    assert cold.root("Amar", "W02")["size"] == 5
+
+def test_unsafe_names_rejected_before_reading(tmp_path):
+    """Brand/week names that would leave the proof root are rejected before the log is read"""
+    store = MerkleStore(log=ProofLog(root=str(tmp_path)))
+
+    def no_read(brand, week):
+        raise AssertionError(f"log read for {brand}/{week}")
+
+    store.log.read = no_read
+    for brand, week in (("..", "W02"), ("Amar", ".."), ("a/b", "W02"), ("", "W02"), (".hidden", "W02")):
+        with pytest.raises(ValueError):
+            store.tree(brand, week)
+        with pytest.raises(ValueError):
+            store.root(brand, week)
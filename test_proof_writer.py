@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Tests for the group-commit proof writer
+Each test writes to its own temporary proof directory
+"""
+
+import asyncio
+import types
+
+import proof_writer
+from proof_log import ProofLog
+from proof_writer import ProofWriter
+
+def make_writer(tmp_path, **kwargs) -> ProofWriter:
+    return ProofWriter(log=ProofLog(root=str(tmp_path)), **kwargs)
+
+def record(post_id: str):
+    return {"post_id": post_id, "sha256": post_id.upper(), "timestamp": "2025-01-06T00:00:00+00:00"}
+
+def post_ids(writer: ProofWriter, brand: str, week: str):
+    return [p["post_id"] for p in writer.log.read(brand, week)["posts"]]
+
+def count_appends(writer: ProofWriter):
+    """Record (brand, week, record count) for every log append the writer makes"""
+    calls = []
+    append = writer.log.append
+
+    def counting(brand, week, records, fsync=False):
+        calls.append((brand, week, len(records)))
+        return append(brand, week, records, fsync=fsync)
+
+    writer.log.append = counting
+    return calls
+
+def test_sync_writes_inline(tmp_path):
+    """sync durability writes on the calling thread and never starts the writer"""
+    writer = make_writer(tmp_path, durability="sync")
+    path = writer.write("Amar", "2025-W02", [record("a"), record("b")])
+    assert path == writer.log.paths("Amar", "2025-W02")[1]
+    assert writer._thread is None
+    assert post_ids(writer, "Amar", "2025-W02") == ["a", "b"]
+    assert writer.index.by_post("Amar", "a")[0]["sha256"] == "a"
+    assert writer.merkle.root("Amar", "2025-W02")["size"] == 2
+
+def test_flush_waits_for_the_write(tmp_path):
+    """flush durability returns once the records are on disk, from sync and async callers"""
+    writer = make_writer(tmp_path, durability="flush", linger_ms=1)
+    try:
+        path = writer.write("Amar", "2025-W02", [record("a")])
+        assert post_ids(writer, "Amar", "2025-W02") == ["a"]
+        assert asyncio.run(writer.write_async("Amar", "2025-W02", [record("b")])) == path
+        assert post_ids(writer, "Amar", "2025-W02") == ["a", "b"]
+        assert writer.index.by_post("Amar", "b")[0]["sha256"] == "b"
+        assert writer.stats()["flushed_records"] == 2
+    finally:
+        writer.shutdown()
+
+def test_enqueue_returns_before_the_write(tmp_path):
+    """enqueue durability acks with the log path before the batch is written"""
+    writer = make_writer(tmp_path, durability="enqueue", linger_ms=10_000)
+    try:
+        path = writer.write("Amar", "2025-W02", [record("a")])
+        assert path == writer.log.paths("Amar", "2025-W02")[1]
+        assert post_ids(writer, "Amar", "2025-W02") == []
+        assert writer.stats()["enqueued"] == 1
+    finally:
+        writer.shutdown()
+    assert post_ids(writer, "Amar", "2025-W02") == ["a"]
+
+def test_batch_groups_by_brand_and_week(tmp_path):
+    """One batch makes one append per brand/week, in submission order, and resolves every future"""
+    writer = make_writer(tmp_path, durability="flush", linger_ms=300)
+    calls = count_appends(writer)
+    submissions = [
+        ("Amar", "2025-W02", ["a1"]),
+        ("Hurry", "2025-W02", ["h1", "h2"]),
+        ("Amar", "2025-W03", ["w1"]),
+        ("Amar", "2025-W02", ["a2", "a3"]),
+        ("Hurry", "2025-W02", ["h3"]),
+    ]
+    try:
+        futures = [writer.submit(brand, week, [record(p) for p in ids]) for brand, week, ids in submissions]
+        paths = [f.result(timeout=5) for f in futures]
+    finally:
+        writer.shutdown()
+    assert paths == [writer.log.paths(brand, week)[1] for brand, week, _ in submissions]
+    assert sorted(calls) == sorted([("Amar", "2025-W02", 3), ("Hurry", "2025-W02", 3), ("Amar", "2025-W03", 1)])
+    assert post_ids(writer, "Amar", "2025-W02") == ["a1", "a2", "a3"]
+    assert post_ids(writer, "Hurry", "2025-W02") == ["h1", "h2", "h3"]
+    assert post_ids(writer, "Amar", "2025-W03") == ["w1"]
+    assert writer.stats()["flushed_batches"] == 3
+    assert writer.stats()["flushed_records"] == 7
+
+def test_batch_respects_max_batch(tmp_path):
+    """A batch stops gathering once it holds max_batch records"""
+    writer = make_writer(tmp_path, durability="enqueue", linger_ms=10_000, max_batch=4)
+    calls = count_appends(writer)
+    try:
+        for i in range(10):
+            writer.write("Amar", "2025-W02", [record(f"p{i}")])
+    finally:
+        writer.shutdown()
+    assert post_ids(writer, "Amar", "2025-W02") == [f"p{i}" for i in range(10)]
+    assert all(count <= 4 for _, _, count in calls)
+
+def test_shutdown_drains_the_queue(tmp_path):
+    """Records still queued at shutdown are written before the thread stops"""
+    writer = make_writer(tmp_path, durability="enqueue", linger_ms=10_000)
+    ids = [f"p{i}" for i in range(50)]
+    for i, post_id in enumerate(ids):
+        writer.write("Amar" if i % 2 else "Hurry", "2025-W02", [record(post_id)])
+    thread = writer._thread
+    writer.shutdown()
+    assert not thread.is_alive()
+    assert writer._thread is None
+    assert post_ids(writer, "Hurry", "2025-W02") == ids[0::2]
+    assert post_ids(writer, "Amar", "2025-W02") == ids[1::2]
+    assert writer.stats()["queue_depth"] == 0
+
+def test_write_after_shutdown_restarts(tmp_path, monkeypatch):
+    """A write after shutdown starts a new writer thread, without registering another exit handler"""
+    registered = []
+    monkeypatch.setattr(proof_writer, "atexit", types.SimpleNamespace(register=registered.append))
+    writer = make_writer(tmp_path, durability="flush", linger_ms=1)
+    try:
+        for post_id in ("a", "b", "c"):
+            writer.write("Amar", "2025-W02", [record(post_id)])
+            writer.shutdown()
+        assert post_ids(writer, "Amar", "2025-W02") == ["a", "b", "c"]
+        assert registered == [writer.shutdown]
+    finally:
+        writer.shutdown()
+
+def test_cancelled_write_async_keeps_writer_alive(tmp_path):
+    """A flush write whose caller gave up is still written, and later writes still complete"""
+    writer = make_writer(tmp_path, durability="flush", linger_ms=200)
+
+    async def run():
+        try:
+            await asyncio.wait_for(writer.write_async("Amar", "2025-W02", [record("gone")]), 0.01)
+        except asyncio.TimeoutError:
+            pass
+        return await asyncio.wait_for(writer.write_async("Amar", "2025-W02", [record("kept")]), 5)
+
+    try:
+        path = asyncio.run(run())
+        assert path == writer.log.paths("Amar", "2025-W02")[1]
+        assert writer._thread is not None and writer._thread.is_alive()
+        assert writer.write("Amar", "2025-W02", [record("after")]) == path
+        posts = writer.log.read("Amar", "2025-W02")["posts"]
+        assert [p["post_id"] for p in posts] == ["gone", "kept", "after"]
+        assert writer.failures == 0
+    finally:
+        writer.shutdown()
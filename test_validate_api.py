@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+In-process tests for the validation endpoints
+Requests go through FastAPI's TestClient; brands are synthetic configs in the
+config cache, and proofs go to a temporary directory
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as app_module
+import validator
+from bench_suite import synthetic_brand
+from config_cache import config_cache
+from proof_log import ProofLog
+from proof_writer import ProofWriter
+from validation_cache import ValidationResultCache
+
+BRAND = "Apibrand"
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    cfg = synthetic_brand(BRAND)
+    # A platform whose rules cannot be compiled, so checking its bundles raises
+    cfg["platforms"].append("Broken")
+    cfg["caption_rules"]["Broken"] = "not a dict"
+    config_cache.put(BRAND, cfg, source="local")
+    monkeypatch.setattr(app_module, "API_TOKEN", None)
+    monkeypatch.setattr(validator, "proof_writer", ProofWriter(log=ProofLog(root=str(tmp_path)), durability="sync"))
+    monkeypatch.setattr(validator, "result_cache", ValidationResultCache())
+    return TestClient(app_module.app)
+
+def bundle(post_id: str, **overrides):
+    b = {
+        "brand": BRAND,
+        "platform": "Instagram",
+        "post_id": post_id,
+        "caption": f"Refurbished phones with quality guaranteed ({post_id})",
+        "hashtags": ["#InstagramTag1", "#InstagramTag2"],
+        "cta": "Shop now",
+        "media_suggestion": {"type": "carousel", "count": 3},
+        "links": [{"url": "https://shop1.example.com/p"}],
+        "week": "W02",
+    }
+    b.update(overrides)
+    return b
+
+def proof_records(brand: str = BRAND):
+    log = validator.proof_writer.log
+    return [p for week in log.weeks(brand) for p in log.read(brand, week)["posts"]]
+
+def test_batch_isolates_failures(client):
+    """Unknown brands and bundles whose checks raise fail alone; the others keep their results"""
+    good = [bundle("good-1"), bundle("good-2")]
+    invalid = bundle("invalid", caption="A total scam")
+    items = [
+        bundle("unknown", brand="No Such Brand Anywhere"),
+        good[0],
+        bundle("raises", platform="Broken"),
+        invalid,
+        good[1],
+    ]
+    resp = client.post("/validate/batch", json={"items": items})
+    assert resp.status_code == 200
+    body = resp.json()
+    results = body["results"]
+    assert body["count"] == 5
+    assert body["valid_count"] == 2
+
+    assert results[0]["type"] == "FileNotFoundError"
+    assert "error" in results[0] and "valid" not in results[0]
+    assert results[2]["type"] == "AttributeError"
+    assert "valid" not in results[2]
+    assert results[3] == {"valid": False, "errors": ["FORBIDDEN_WORD:scam"], "suggestions": {}}
+    for result, item in ((results[1], good[0]), (results[4], good[1])):
+        assert result["valid"] is True
+        assert result["normalized_bundle"]["post_id"] == item["post_id"]
+
+    # Only the passing bundles wrote proofs
+    assert sorted(p["post_id"] for p in proof_records()) == ["good-1", "good-2"]
+
+    # The same bundles without the failing ones get the same results
+    validator.result_cache.clear()
+    alone = client.post("/validate/batch", json={"items": [good[0], invalid, good[1]]}).json()["results"]
+    assert [r.get("sha256") for r in alone] == [results[1]["sha256"], None, results[4]["sha256"]]
+    assert alone[1] == results[3]
+    assert [r.get("normalized_bundle") for r in alone] == [results[1]["normalized_bundle"], None,
+                                                            results[4]["normalized_bundle"]]
+
+def test_identical_bundle_is_replayed(client):
+    """Resubmitting an identical bundle returns the stored result and writes no second proof"""
+    first = client.post("/validate", json=bundle("replay-1"))
+    assert first.status_code == 200 and first.json()["valid"] is True
+    again = client.post("/validate", json=bundle("replay-1"))
+    assert again.json() == first.json()
+    assert [p["post_id"] for p in proof_records()] == ["replay-1"]
+
+    # A changed bundle is validated afresh
+    changed = client.post("/validate", json=bundle("replay-1", caption="Another caption entirely"))
+    assert changed.json()["sha256"] != first.json()["sha256"]
+    assert [p["post_id"] for p in proof_records()] == ["replay-1", "replay-1"]
+
+def test_idempotency_key(client):
+    """A repeated Idempotency-Key replays its result; with a different bundle it is rejected with 422"""
+    headers = {"Idempotency-Key": "key-1"}
+    first = client.post("/validate", json=bundle("idem-1"), headers=headers)
+    assert first.status_code == 200 and first.json()["valid"] is True
+    again = client.post("/validate", json=bundle("idem-1"), headers=headers)
+    assert again.status_code == 200
+    assert again.json() == first.json()
+
+    reused = client.post("/validate", json=bundle("idem-2"), headers=headers)
+    assert reused.status_code == 422
+    assert "key-1" in reused.json()["detail"]
+    assert [p["post_id"] for p in proof_records()] == ["idem-1"]
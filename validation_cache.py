@@ -0,0 +1,104 @@
+"""
+Result cache that makes repeated validations idempotent
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Hashable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+class IdempotencyKeyReused(ValueError):
+    """An Idempotency-Key was sent again with a different bundle"""
+
+@dataclass
+class CachedResult:
+    result: Tuple[bool, List[str], Dict]
+    request_hash: str
+    stored_at: float
+
+class ValidationResultCache:
+    def __init__(self, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Initialize the result cache
+
+        Args:
+            max_entries: LRU bound on stored results
+            ttl: Seconds a result is replayed before the bundle is validated again
+        """
+        self.max_entries = max_entries or int(os.getenv("VALIDATION_CACHE_MAX_ENTRIES", "10000"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("VALIDATION_CACHE_TTL", "3600"))
+        self._entries: "OrderedDict[Hashable, CachedResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(bundle_hash: str, config_version: str, week: str, idempotency_key: Optional[str] = None) -> Hashable:
+        """
+        Cache key for a validation
+
+        With an Idempotency-Key the client's key decides; otherwise the bundle
+        content, the config version it was checked against and the proof week do,
+        so a config change or a new week validates (and writes a proof) afresh.
+        """
+        if idempotency_key:
+            return ("idempotency", idempotency_key)
+        return ("bundle", bundle_hash, config_version, week)
+
+    def get(self, key: Hashable, request_hash: str) -> Optional[Tuple[bool, List[str], Dict]]:
+        """
+        Stored result for key, or None if missing or expired
+
+        Raises:
+            IdempotencyKeyReused: key is an Idempotency-Key stored for another bundle
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry.stored_at >= self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.request_hash != request_hash:
+                raise IdempotencyKeyReused(f"Idempotency-Key {key[1]} was already used for a different bundle")
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.result
+
+    def put(self, key: Hashable, result: Tuple[bool, List[str], Dict], request_hash: str):
+        """Store a result (shared with later callers, who must not mutate it)"""
+        with self._lock:
+            self._entries[key] = CachedResult(result=result, request_hash=request_hash, stored_at=time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+# Global instance
+result_cache = ValidationResultCache()
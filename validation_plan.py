@@ -0,0 +1,200 @@
+"""
+Precompiled per-brand, per-platform validation plans
+"""
+import os
+import threading
+import itertools
+from time import perf_counter
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from forbidden_matcher import ForbiddenWordMatcher, get_matcher
+from link_pipeline import UtmTemplate, add_query, host_allowed, normalize_domain, parse_host, short_links
+from metrics import check_seconds, CHECK_SAMPLE_EVERY
+
+_runs = itertools.count()
+
+def _no_clock() -> float:
+    return 0.0
+
+def _as_int(value: Any, default: int) -> int:
+    # Sheets-backed configs carry every value as a string
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "yes", "1")
+    return bool(value)
+
+def _as_set(value: Any) -> FrozenSet[str]:
+    if isinstance(value, str):
+        return frozenset(v.strip() for v in value.split(",") if v.strip())
+    return frozenset(value or [])
+
+@dataclass(frozen=True)
+class ValidationPlan:
+    brand: str
+    platform: str
+    version: str
+    platform_enabled: bool
+    max_chars: int
+    forbidden: ForbiddenWordMatcher
+    forbidden_word_boundary: bool
+    hashtag_bank: FrozenSet[str]
+    cta_bank: FrozenSet[str]
+    media_allowed: FrozenSet[str]
+    max_carousel: int
+    allowed_domains: FrozenSet[str]
+    utm: Optional[UtmTemplate]
+    # Empty when links are not shortened
+    shortener_domain: str
+
+    def run(self, bundle: Dict) -> Tuple[List[str], Dict]:
+        """Run every check on a bundle; returns (errors, normalized bundle)"""
+        errors: List[str] = []
+        caption = bundle.get("caption", "")
+        timed = next(_runs) % CHECK_SAMPLE_EVERY == 0
+        clock = perf_counter if timed else _no_clock
+        t0 = clock()
+
+        if not self.platform_enabled:
+            errors.append(f"PLATFORM_NOT_ENABLED:{self.platform}")
+
+        if len(caption) > self.max_chars:
+            errors.append(f"CAPTION_TOO_LONG:{len(caption)}>{self.max_chars}")
+        t1 = clock()
+
+        for w in self.forbidden.matched_words(caption, self.forbidden_word_boundary):
+            errors.append(f"FORBIDDEN_WORD:{w}")
+        t2 = clock()
+
+        if self.hashtag_bank:
+            for h in bundle.get("hashtags", []):
+                if h not in self.hashtag_bank:
+                    errors.append(f"HASHTAG_NOT_ALLOWED:{h}")
+        cta = bundle.get("cta")
+        if cta and self.cta_bank and cta not in self.cta_bank:
+            errors.append(f"CTA_NOT_ALLOWED:{cta}")
+        t3 = clock()
+
+        media = bundle.get("media_suggestion", {})
+        mtype = media.get("type")
+        if mtype not in self.media_allowed:
+            errors.append(f"MEDIA_TYPE_NOT_ALLOWED:{mtype}")
+        if mtype == "carousel":
+            count = media.get("count") or 0
+            if count < 1 or count > self.max_carousel:
+                errors.append(f"CAROUSEL_COUNT_INVALID:{count}>{self.max_carousel}")
+        t4 = clock()
+
+        links = bundle.get("links", [])
+        for l in links:
+            url = l.get("url", "")
+            host = parse_host(url)
+            if not host_allowed(host, self.allowed_domains):
+                errors.append(f"LINK_DOMAIN_NOT_ALLOWED:{host or url}")
+        t5 = clock()
+
+        # normalize and apply UTM (on copies, so the caller's links are untouched)
+        normalized = dict(bundle)
+        if links and self.utm:
+            utm = self.utm.render(bundle.get("week") or "W00")
+            normalized["links"] = [
+                {**l, "url": add_query(l["url"], utm)} if l.get("utm") else l for l in links]
+        t6 = clock()
+
+        if timed:
+            # Named after the validator.check_* function each block replaces
+            check_seconds.observe_many((
+                ("check_caption_rules", t1 - t0),
+                ("check_forbidden_words", t2 - t1),
+                ("check_bank", t3 - t2),
+                ("check_media_policy", t4 - t3),
+                ("check_link_policy", t5 - t4),
+                ("apply_utm", t6 - t5),
+            ))
+        return errors, normalized
+
+    def needs_shortening(self, normalized: Dict) -> bool:
+        """True if shorten() would call the shortener for this bundle"""
+        return bool(self.shortener_domain and normalized.get("links"))
+
+    def shorten(self, normalized: Dict) -> Dict:
+        """
+        Shorten the links of a bundle that passed run()
+
+        Kept out of run() because a shortener may call out over the network:
+        event-loop callers run it on a worker thread. Invalid bundles are
+        rejected anyway, so only valid ones should spend shortener calls.
+        """
+        if not self.needs_shortening(normalized):
+            return normalized
+        started = perf_counter()
+        shortened = dict(normalized)
+        shortened["links"] = [
+            {**l, "url": short_links.shorten(l["url"], self.shortener_domain)} if l.get("url") else l
+            for l in normalized["links"]]
+        check_seconds.observe(perf_counter() - started, "shorten_links")
+        return shortened
+
+def compile_plan(cfg: Dict, platform: str, version: str = "") -> ValidationPlan:
+    """Build the validation plan for one brand config and platform"""
+    caption_rules = cfg.get("caption_rules", {}).get(platform, {})
+    media_policy = cfg.get("media_policy", {}).get(platform, {})
+    link_policy = cfg.get("link_policy", {})
+    return ValidationPlan(
+        brand=cfg["brand"],
+        platform=platform,
+        version=version,
+        platform_enabled=platform in cfg.get("platforms", []),
+        max_chars=_as_int(caption_rules.get("max_chars"), 99999),
+        forbidden=get_matcher(cfg.get("forbidden_words", [])),
+        forbidden_word_boundary=bool(cfg.get("forbidden_words_word_boundary", False)),
+        hashtag_bank=_as_set(cfg.get("hashtag_bank", {}).get(platform, [])),
+        cta_bank=_as_set(cfg.get("cta_bank", {}).get(platform, [])),
+        media_allowed=_as_set(media_policy.get("allowed", [])),
+        max_carousel=_as_int(media_policy.get("max_carousel"), 10),
+        allowed_domains=frozenset(normalize_domain(d) for d in link_policy.get("allowed_domains", [])),
+        utm=UtmTemplate(link_policy["utm_template"], cfg["brand"], platform) if link_policy.get("utm_template") else None,
+        shortener_domain=(link_policy.get("shortener_domain", "")
+                          if short_links.enabled and _as_bool(link_policy.get("use_shortener")) else ""),
+    )
+
+class PlanCache:
+    def __init__(self, max_entries: int = None):
+        """
+        Initialize the plan cache
+
+        Args:
+            max_entries: LRU bound on compiled plans
+        """
+        self.max_entries = max_entries or int(os.getenv("VALIDATION_PLAN_MAX_ENTRIES", "256"))
+        self._plans: "OrderedDict[Tuple[str, str], ValidationPlan]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.compiles = 0
+
+    def get(self, cfg: Dict, version: str, platform: str) -> ValidationPlan:
+        """Plan for a config version and platform, compiled on first use"""
+        key = (version, platform)
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                return plan
+        plan = compile_plan(cfg, platform, version)
+        with self._lock:
+            self._plans[key] = plan
+            self.compiles += 1
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return plan
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"plans": len(self._plans), "compiles": self.compiles}
+
+# Global instance
+plan_cache = PlanCache()
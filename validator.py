@@ -1,8 +1,21 @@
-import hashlib, json, os, re
+import json, os, re
+import anyio
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dateutil import tz
 from typing import Dict, List, Tuple, Optional
 from google_sheets_service import sheets_service
+from circuit_breaker import sheets_breaker, CircuitOpenError
+from config_cache import config_cache, CachedConfig
+from config_snapshot import local_snapshot
+from forbidden_matcher import get_matcher
+from proof_writer import proof_writer
+from validation_plan import ValidationPlan, plan_cache
+from metrics import stage_seconds, validations, validation_seconds
+from validation_cache import result_cache
+from canonical_hash import canonical_hasher
+from link_pipeline import add_query, allowed_domain_set, host_allowed, parse_host
 
 def _cfg_path(brand: str) -> str:
     # Try multiple possible paths for the config directory
@@ -19,27 +32,65 @@ def _cfg_path(brand: str) -> str:
     # If none found, return the first one (will raise FileNotFoundError)
     return possible_paths[0]
 
-def load_brand_config(brand: str) -> Dict:
-    """
-    Load brand configuration from Google Sheets or local files
-    
-    Args:
-        brand: Brand name
+def _load_brand_entry(brand: str) -> CachedConfig:
+    """Cached config entry for a brand, loading from Google Sheets or local files on a miss"""
+    entry = config_cache.get_entry(brand)
+    if entry is not None:
+        return entry
     
-    Returns:
-        Brand configuration dictionary
-    """
     # Try Google Sheets first
-    if sheets_service.is_available():
+    fallback = sheets_service.is_available()
+    if fallback:
         try:
             print(f"📊 Loading {brand} config from Google Sheets...")
-            return sheets_service.get_brand_config(brand)
+            return config_cache.put(brand, sheets_breaker.call(sheets_service.get_brand_config, brand), source="sheets")
+        except CircuitOpenError:
+            # Sheets is known to be down; go straight to local configs
+            pass
         except Exception as e:
             print(f"⚠️ Google Sheets failed for {brand}: {e}")
             print(f"📁 Falling back to local config...")
     
-    # Fallback to local files
-    return _load_local_config(brand)
+    # Fallback to local files, preferring the binary snapshot when it is current.
+    # With Sheets configured the entry expires, so Sheets is tried again later.
+    compiled = local_snapshot.get(brand)
+    if compiled is not None:
+        cfg, path = compiled
+        return config_cache.put(brand, cfg, source="local", path=path, fallback=fallback)
+    return config_cache.put(brand, _load_local_config(brand), source="local", path=_cfg_path(brand),
+                            fallback=fallback)
+
+async def _load_brand_entry_async(brand: str) -> CachedConfig:
+    """Like _load_brand_entry, but only leaves the event loop on a cache miss"""
+    entry = config_cache.get_entry(brand)
+    if entry is not None:
+        return entry
+    return await anyio.to_thread.run_sync(_load_brand_entry, brand)
+
+def load_brand_config(brand: str) -> Dict:
+    """
+    Load brand configuration from the in-process cache, Google Sheets or local files
+    
+    Args:
+        brand: Brand name
+    
+    Returns:
+        Brand configuration dictionary (shared with the cache, do not mutate)
+    """
+    return _load_brand_entry(brand).config
+
+async def load_brand_config_async(brand: str) -> Dict:
+    """Async load_brand_config for request handlers"""
+    return (await _load_brand_entry_async(brand)).config
+
+def get_config_version(brand: str) -> str:
+    """Content version of the brand config currently served for this brand"""
+    return _load_brand_entry(brand).version
+
+def get_validation_plan(brand: str, platform: str) -> ValidationPlan:
+    """Compiled validation plan for a brand/platform, rebuilt when the config version changes"""
+    entry = _load_brand_entry(brand)
+    return plan_cache.get(entry.config, entry.version, platform)
 
 def _load_local_config(brand: str) -> Dict:
     """Load brand configuration from local JSON files"""
@@ -56,9 +107,8 @@ def check_caption_rules(caption: str, rules: Dict) -> List[str]:
         errors.append(f"CAPTION_TOO_LONG:{len(caption)}>{max_chars}")
     return errors
 
-def check_forbidden_words(text: str, words: List[str]) -> List[str]:
-    low = text.lower()
-    hits = [w for w in words if w.lower() in low]
+def check_forbidden_words(text: str, words: List[str], word_boundary: bool = False) -> List[str]:
+    hits = get_matcher(words).matched_words(text, word_boundary)
     return [f"FORBIDDEN_WORD:{w}" for w in hits]
 
 def check_bank(values: List[str], bank: List[str], field: str) -> List[str]:
@@ -73,7 +123,7 @@ def check_media_policy(media: Dict, policy: Dict) -> List[str]:
     if mtype not in allowed:
         errors.append(f"MEDIA_TYPE_NOT_ALLOWED:{mtype}")
     if mtype == "carousel":
-        count = media.get("count", 0)
+        count = media.get("count") or 0
         maxc = policy.get("max_carousel", 10)
         if count < 1 or count > maxc:
             errors.append(f"CAROUSEL_COUNT_INVALID:{count}>{maxc}")
@@ -81,89 +131,217 @@ def check_media_policy(media: Dict, policy: Dict) -> List[str]:
 
 def check_link_policy(links: List[Dict], policy: Dict) -> List[str]:
     errors = []
-    allowed = [d.lower() for d in policy.get("allowed_domains", [])]
+    allowed = allowed_domain_set(tuple(policy.get("allowed_domains", [])))
     for l in links:
         url = l.get("url","")
-        domain = url.split("/")[2].lower() if "://" in url else url
-        if not any(domain.endswith(ad) for ad in allowed):
-            errors.append(f"LINK_DOMAIN_NOT_ALLOWED:{domain}")
+        host = parse_host(url)
+        if not host_allowed(host, allowed):
+            errors.append(f"LINK_DOMAIN_NOT_ALLOWED:{host or url}")
     return errors
 
 def apply_utm(url: str, brand: str, platform: str, week: str, tpl: str) -> str:
     if not tpl: return url
-    sep = "&" if "?" in url else "?"
-    utm = tpl.format(platform=platform.lower(), brand=brand.lower(), week=week)
-    return f"{url}{sep}{utm}"
+    return add_query(url, tpl.format(platform=platform.lower(), brand=brand.lower(), week=week))
 
 def sha256_of_bundle(bundle: Dict) -> str:
-    data = json.dumps(bundle, sort_keys=True, ensure_ascii=False).encode("utf-8")
-    return hashlib.sha256(data).hexdigest()
+    return canonical_hasher.hexdigest(bundle)
 
 def iso_week_str(now: datetime, tz_name: str = "Europe/London") -> str:
     d = now.astimezone(tz.gettz(tz_name))
     return f"W{d.isocalendar().week:02d}"
 
 def write_proof(brand_cfg: Dict, post_id: str, sha: str, ts: datetime) -> str:
+    return write_proofs(brand_cfg, [(post_id, sha)], ts)
+
+def write_proofs(brand_cfg: Dict, entries: List[Tuple[str, str]], ts: datetime) -> str:
+    """Hand several (post_id, sha256) records to the proof writer as one week-log write"""
     week = iso_week_str(ts, brand_cfg["proof_manifest"]["timezone"])
-    # Use a writable directory instead of /Codex
-    root = os.path.join(os.getcwd(), "proofs", brand_cfg["brand"])
-    os.makedirs(root, exist_ok=True)
-    fp = os.path.join(root, f"{week}.hash")
-    record = {"post_id": post_id, "sha256": sha, "timestamp": ts.isoformat()}
-    blob = {"brand": brand_cfg["brand"], "week": week, "posts": [record]}
-    if os.path.exists(fp):
-        try:
-            with open(fp, "r", encoding="utf-8") as f:
-                blob = json.load(f)
-        except Exception:
-            blob = {"brand": brand_cfg["brand"], "week": week, "posts": []}
-        blob["posts"].append(record)
-    with open(fp, "w", encoding="utf-8") as f:
-        json.dump(blob, f, ensure_ascii=False, indent=2)
-    return fp
-
-def validate(bundle: Dict) -> Tuple[bool, List[str], Dict]:
-    # load brand
-    cfg = load_brand_config(bundle["brand"])
-    platform = bundle["platform"]
-    errors: List[str] = []
-
-    # platform enabled?
-    if platform not in cfg.get("platforms", []):
-        errors.append(f"PLATFORM_NOT_ENABLED:{platform}")
-
-    # caption rules
-    cap_rules = cfg.get("caption_rules", {}).get(platform, {})
-    errors += check_caption_rules(bundle.get("caption",""), cap_rules)
-
-    # forbidden words
-    errors += check_forbidden_words(bundle.get("caption",""), cfg.get("forbidden_words", []))
-
-    # hashtag / CTA banks (if provided)
-    bank = cfg.get("hashtag_bank", {}).get(platform, [])
-    errors += check_bank(bundle.get("hashtags", []), bank, "hashtag")
-    ctabank = cfg.get("cta_bank", {}).get(platform, [])
-    if bundle.get("cta"):
-        errors += check_bank([bundle["cta"]], ctabank, "cta")
-
-    # media policy
-    media_policy = cfg.get("media_policy", {}).get(platform, {})
-    errors += check_media_policy(bundle.get("media_suggestion", {}), media_policy)
-
-    # links / domain
-    errors += check_link_policy(bundle.get("links", []), cfg.get("link_policy", {}))
-
-    # normalize & apply UTM
-    normalized = dict(bundle)
-    lp = cfg.get("link_policy", {})
-    for l in normalized.get("links", []):
-        if l.get("utm"):
-            l["url"] = apply_utm(l["url"], cfg["brand"], platform, bundle.get("week") or "W00", lp.get("utm_template",""))
-
-    ok = len(errors) == 0
-    if not ok:
+    records = [{"post_id": post_id, "sha256": sha, "timestamp": ts.isoformat()} for post_id, sha in entries]
+    return proof_writer.write(brand_cfg["brand"], week, records)
+
+async def write_proofs_async(brand_cfg: Dict, entries: List[Tuple[str, str]], ts: datetime) -> str:
+    """Async write_proofs: awaits the proof writer instead of blocking a thread"""
+    week = iso_week_str(ts, brand_cfg["proof_manifest"]["timezone"])
+    records = [{"post_id": post_id, "sha256": sha, "timestamp": ts.isoformat()} for post_id, sha in entries]
+    return await proof_writer.write_async(brand_cfg["brand"], week, records)
+
+def _record_validation(cfg: Dict, ok: bool, started: Optional[float] = None):
+    # Label by the config's own brand name so request spelling cannot add series
+    brand = cfg.get("brand", "unknown")
+    validations.inc(brand, "valid" if ok else "invalid")
+    if started is not None:
+        validation_seconds.observe(perf_counter() - started, brand)
+
+def _cached_result(entry: CachedConfig, bundle: Dict, ts: datetime, idempotency_key: Optional[str] = None):
+    """(cache key, bundle hash, stored result or None) for a bundle about to be validated"""
+    bundle_hash = sha256_of_bundle(bundle)
+    week = iso_week_str(ts, entry.config.get("proof_manifest", {}).get("timezone", "Europe/London"))
+    key = result_cache.key(bundle_hash, entry.version, week, idempotency_key)
+    return key, bundle_hash, result_cache.get(key, bundle_hash)
+
+def validate(bundle: Dict, idempotency_key: Optional[str] = None) -> Tuple[bool, List[str], Dict]:
+    # load brand and its compiled plan
+    started = perf_counter()
+    entry = _load_brand_entry(bundle["brand"])
+    stage_seconds.observe(perf_counter() - started, "config_load")
+    ts = datetime.utcnow()
+    key, bundle_hash, cached = _cached_result(entry, bundle, ts, idempotency_key)
+    if cached is not None:
+        validations.inc(entry.config.get("brand", "unknown"), "replayed")
+        return cached
+    plan = plan_cache.get(entry.config, entry.version, bundle["platform"])
+    errors, normalized = plan.run(bundle)
+    if errors:
+        _record_validation(entry.config, False, started)
+        result_cache.put(key, (False, errors, {}), bundle_hash)
+        return False, errors, {}
+    normalized = plan.shorten(normalized)
+
+    t0 = perf_counter()
+    sha = sha256_of_bundle(normalized)
+    t1 = perf_counter()
+    proof_file = write_proof(entry.config, bundle.get("post_id","post"), sha, ts)
+    stage_seconds.observe_many((("sha256", t1 - t0), ("proof_write", perf_counter() - t1)))
+    _record_validation(entry.config, True, started)
+    result = (True, [], {"sha256": sha, "proof_file": proof_file, "normalized_bundle": normalized})
+    result_cache.put(key, result, bundle_hash)
+    return result
+
+async def validate_async(bundle: Dict, idempotency_key: Optional[str] = None) -> Tuple[bool, List[str], Dict]:
+    """
+    Async validate() for request handlers
+    
+    The config comes from memory, the checks run inline (they are plain set and
+    string operations), link shortening runs on a worker thread, and the proof
+    write is awaited. A bundle already validated against the same config
+    version this week, or a repeated idempotency_key, gets the stored result
+    without a new proof record.
+    
+    Raises:
+        IdempotencyKeyReused: idempotency_key was already used for another bundle
+    """
+    started = perf_counter()
+    entry = await _load_brand_entry_async(bundle["brand"])
+    stage_seconds.observe(perf_counter() - started, "config_load")
+    ts = datetime.utcnow()
+    key, bundle_hash, cached = _cached_result(entry, bundle, ts, idempotency_key)
+    if cached is not None:
+        validations.inc(entry.config.get("brand", "unknown"), "replayed")
+        return cached
+    plan = plan_cache.get(entry.config, entry.version, bundle["platform"])
+    errors, normalized = plan.run(bundle)
+    if errors:
+        _record_validation(entry.config, False, started)
+        result_cache.put(key, (False, errors, {}), bundle_hash)
         return False, errors, {}
+    if plan.needs_shortening(normalized):
+        # The shortener may call out over the network; keep it off the event loop
+        normalized = await anyio.to_thread.run_sync(plan.shorten, normalized)
 
+    t0 = perf_counter()
     sha = sha256_of_bundle(normalized)
-    proof_file = write_proof(cfg, bundle.get("post_id","post"), sha, datetime.utcnow())
-    return True, [], {"sha256": sha, "proof_file": proof_file, "normalized_bundle": normalized}
+    t1 = perf_counter()
+    proof_file = await write_proofs_async(entry.config, [(bundle.get("post_id","post"), sha)], ts)
+    stage_seconds.observe_many((("sha256", t1 - t0), ("proof_write", perf_counter() - t1)))
+    _record_validation(entry.config, True, started)
+    result = (True, [], {"sha256": sha, "proof_file": proof_file, "normalized_bundle": normalized})
+    result_cache.put(key, result, bundle_hash)
+    return result
+
+def validate_batch(bundles: List[Dict], max_workers: Optional[int] = None) -> List[Tuple[bool, List[str], Dict]]:
+    """
+    Validate many bundles at once
+    
+    Bundles are grouped by brand so each config is resolved once, checked on a
+    worker pool, and all proofs for a brand/week are written in one write.
+    
+    Args:
+        bundles: List of bundles as accepted by validate()
+        max_workers: Worker pool size (defaults to VALIDATE_BATCH_WORKERS)
+    
+    Returns:
+        One (ok, errors, payload) tuple per bundle, in input order. A bundle whose
+        brand config cannot be loaded, whose checks raise or whose proof cannot be
+        written gets payload {"error": ..., "type": ...}.
+    """
+    results: List[Optional[Tuple[bool, List[str], Dict]]] = [None] * len(bundles)
+    by_brand: Dict[str, List[int]] = {}
+    for i, b in enumerate(bundles):
+        by_brand.setdefault(b["brand"], []).append(i)
+
+    workers = max_workers or int(os.getenv("VALIDATE_BATCH_WORKERS", "4"))
+    ts = datetime.utcnow()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for brand, idxs in by_brand.items():
+            try:
+                started = perf_counter()
+                entry = _load_brand_entry(brand)
+                stage_seconds.observe(perf_counter() - started, "config_load")
+            except Exception as e:
+                for i in idxs:
+                    results[i] = (False, [], {"error": str(e), "type": type(e).__name__})
+                continue
+
+            cfg = entry.config
+            # Bundles validated before (same content, config version and week) are
+            # replayed, and repeats within the batch reuse the first one's result
+            todo = []
+            first_by_key: Dict = {}
+            repeats: List[Tuple[int, int]] = []
+            for i in idxs:
+                key, bundle_hash, cached = _cached_result(entry, bundles[i], ts)
+                if cached is not None:
+                    results[i] = cached
+                elif key in first_by_key:
+                    repeats.append((i, first_by_key[key]))
+                else:
+                    first_by_key[key] = i
+                    todo.append((i, key, bundle_hash))
+            validations.inc(cfg.get("brand", "unknown"), "replayed", amount=len(idxs) - len(todo))
+            if not todo:
+                continue
+
+            def check(t):
+                # A bundle that breaks its checks fails alone, not the whole batch
+                try:
+                    plan = plan_cache.get(cfg, entry.version, bundles[t[0]]["platform"])
+                    errors, normalized = plan.run(bundles[t[0]])
+                    return errors, (normalized if errors else plan.shorten(normalized))
+                except Exception as e:
+                    return e
+
+            checked = list(pool.map(check, todo))
+            passed = []
+            timings = []
+            failed = 0
+            for (i, key, bundle_hash), outcome in zip(todo, checked):
+                if isinstance(outcome, Exception):
+                    failed += 1
+                    results[i] = (False, [], {"error": str(outcome), "type": type(outcome).__name__})
+                    continue
+                errors, normalized = outcome
+                if errors:
+                    results[i] = (False, errors, {})
+                    result_cache.put(key, results[i], bundle_hash)
+                else:
+                    t0 = perf_counter()
+                    passed.append((i, key, bundle_hash, normalized, sha256_of_bundle(normalized)))
+                    timings.append(("sha256", perf_counter() - t0))
+            validations.inc(cfg.get("brand", "unknown"), "invalid", amount=len(todo) - len(passed) - failed)
+            if passed:
+                t1 = perf_counter()
+                try:
+                    proof_file = write_proofs(cfg, [(bundles[i].get("post_id","post"), sha) for i, _, _, _, sha in passed], ts)
+                except Exception as e:
+                    for i, _, _, _, _ in passed:
+                        results[i] = (False, [], {"error": str(e), "type": type(e).__name__})
+                    passed = []
+                timings.append(("proof_write", perf_counter() - t1))
+                validations.inc(cfg.get("brand", "unknown"), "valid", amount=len(passed))
+                for i, key, bundle_hash, normalized, sha in passed:
+                    results[i] = (True, [], {"sha256": sha, "proof_file": proof_file, "normalized_bundle": normalized})
+                    result_cache.put(key, results[i], bundle_hash)
+            stage_seconds.observe_many(timings)
+            for i, first in repeats:
+                results[i] = results[first]
+    return results